@@ -1,20 +1,23 @@
 from __future__ import annotations
 
+import asyncio
 import importlib.util
 import logging
-from collections import Counter
-from datetime import datetime
+import re
+from collections import deque
+from datetime import datetime, timedelta
 from importlib.machinery import ModuleSpec
 from logging import Logger
 from pathlib import Path
+import sqlite3
 import sys
 from types import ModuleType
-from typing import Any, Dict, List, Literal, MutableMapping, Optional, Sequence, Tuple
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Literal, MutableMapping, NoReturn, Optional, Set, Tuple, Type, TypeVar, Union
 
 import discord
 from bot.database import Database
 from discord import Interaction, PartialEmoji
-from discord.app_commands import describe
+from discord.app_commands import Choice, autocomplete, default_permissions, describe
 
 log: Logger = logging.getLogger(__name__)
 
@@ -35,9 +38,16 @@ if not spec.loader: raise Exception(f'Could not find Loader for ModuleSpec {modu
 spec.loader.exec_module(module)
 log.debug(f'Imported companion ModuleType {module.__name__} from {module.__path__}')
 
-from audio import (AudioError, FileRequest, Metadata, MidiRequest, Player,
-                   Request, RequestEmbed, RequestFrequencyEmbed,
-                   RequestRecentEmbed, YouTubeRequest, PlaybackExceptionEmbed)
+from audio import (METADATA_INDEX, PROFILER, REGISTRY, SELECT_RECENT,
+                   SELECT_SUMMARIES, Admission, AsyncDatabase, AudioError,
+                   FileRequest, History, HistoryIndex, IndexEntry, Loudness,
+                   MemoryProfileEmbed, Metadata, MidiRequest, Player,
+                   ProcessStatsEmbed, QueueEntry, QueueJournal, Radio, Request,
+                   RequestBulkEmbed, RequestEmbed, RequestFrequencyEmbed, RequestRecentEmbed,
+                   RequestSearchEmbed, RequeueView, Retention, Statistics,
+                   Warmup, YouTubeRequest, PlaybackExceptionEmbed, analyze)
+
+StorableType = TypeVar('StorableType', Metadata, Loudness)
 
 
 class Audio():
@@ -114,6 +124,223 @@ class Audio():
             self._config[key] = ''
             return None
 
+    @property
+    def prefetch(self) -> Optional[bool]:
+        key: str = 'prefetch'
+        value: Optional[str] = None
+        try:
+            value = self._config[key]
+            if value.lower() in ['true', 'yes', 'y', '1']:
+                return True
+            if value.lower() in ['false', 'no', 'n', '0']:
+                return False
+            return None
+        except:
+            self._config[key] = ""
+            return None
+
+    @property
+    def loudness(self) -> Optional[float]:
+        key: str = 'loudness'
+        value: Optional[str] = None
+        try:
+            value = self._config[key]
+            return float(value) if value else None
+        except:
+            self._config[key] = ""
+            return None
+
+    @property
+    def radio_mode(self) -> Optional[bool]:
+        key: str = 'radio'
+        value: Optional[str] = None
+        try:
+            value = self._config[key]
+            if value.lower() in ['true', 'yes', 'y', '1']:
+                return True
+            if value.lower() in ['false', 'no', 'n', '0']:
+                return False
+            return None
+        except:
+            self._config[key] = ""
+            return None
+
+    @radio_mode.setter
+    def radio_mode(self, value: bool) -> None:
+        key: str = 'radio'
+        self._config[key] = str(value).lower()
+
+    @property
+    def retention(self) -> Optional[timedelta]:
+        key: str = 'retention'
+        value: Optional[str] = None
+        try:
+            value = self._config[key]
+            return timedelta(days=float(value)) if value else None
+        except:
+            self._config[key] = ""
+            return None
+
+    @property
+    def archive(self) -> Path:
+        key: str = 'archive'
+        value: Optional[str] = None
+        try:
+            value = self._config[key]
+            return Path(value) if value else Path('./data/archive')
+        except:
+            self._config[key] = ""
+            return Path('./data/archive')
+
+    @property
+    def attachment_input(self) -> Literal['url', 'spool', 'pipe']:
+        key: str = 'attachment_input'
+        value: Optional[str] = None
+        try:
+            value = self._config[key]
+            if value.lower() == 'spool': return 'spool'
+            if value.lower() == 'pipe': return 'pipe'
+            return 'url'
+        except:
+            self._config[key] = ""
+            return 'url'
+
+    @property
+    def profile_memory(self) -> Optional[bool]:
+        key: str = 'profile_memory'
+        value: Optional[str] = None
+        try:
+            value = self._config[key]
+            if value.lower() in ['true', 'yes', 'y', '1']:
+                return True
+            if value.lower() in ['false', 'no', 'n', '0']:
+                return False
+            return None
+        except:
+            self._config[key] = ""
+            return None
+
+    @property
+    def admission_rate(self) -> float:
+        key: str = 'admission_rate'
+        value: Optional[str] = None
+        try:
+            value = self._config[key]
+            return float(value) if value else 5
+        except:
+            self._config[key] = ""
+            return 5
+
+    @property
+    def admission_burst(self) -> int:
+        key: str = 'admission_burst'
+        value: Optional[str] = None
+        try:
+            value = self._config[key]
+            return int(value) if value else 20
+        except:
+            self._config[key] = ""
+            return 20
+
+    @property
+    def guild_admission_rate(self) -> float:
+        key: str = 'guild_admission_rate'
+        value: Optional[str] = None
+        try:
+            value = self._config[key]
+            return float(value) if value else 1
+        except:
+            self._config[key] = ""
+            return 1
+
+    @property
+    def guild_admission_burst(self) -> int:
+        key: str = 'guild_admission_burst'
+        value: Optional[str] = None
+        try:
+            value = self._config[key]
+            return int(value) if value else 5
+        except:
+            self._config[key] = ""
+            return 5
+
+    @property
+    def admission_backlog(self) -> int:
+        key: str = 'admission_backlog'
+        value: Optional[str] = None
+        try:
+            value = self._config[key]
+            return int(value) if value else 50
+        except:
+            self._config[key] = ""
+            return 50
+
+    @property
+    def analysis_concurrency(self) -> int:
+        key: str = 'analysis_concurrency'
+        value: Optional[str] = None
+        try:
+            value = self._config[key]
+            return max(int(value), 1) if value else 1
+        except:
+            self._config[key] = ""
+            return 1
+
+    @property
+    def analysis_backlog(self) -> int:
+        key: str = 'analysis_backlog'
+        value: Optional[str] = None
+        try:
+            value = self._config[key]
+            return int(value) if value else 20
+        except:
+            self._config[key] = ""
+            return 20
+
+    @property
+    def bulk_limit(self) -> int:
+        key: str = 'bulk_limit'
+        value: Optional[str] = None
+        try:
+            value = self._config[key]
+            return int(value) if value else 25
+        except:
+            self._config[key] = ""
+            return 25
+
+    @property
+    def bulk_concurrency(self) -> int:
+        key: str = 'bulk_concurrency'
+        value: Optional[str] = None
+        try:
+            value = self._config[key]
+            return int(value) if value else 4
+        except:
+            self._config[key] = ""
+            return 4
+
+    @property
+    def warmup(self) -> int:
+        key: str = 'warmup'
+        value: Optional[str] = None
+        try:
+            value = self._config[key]
+            return int(value) if value else 0
+        except:
+            self._config[key] = ""
+            return 0
+
+    @property
+    def warmup_interval(self) -> timedelta:
+        key: str = 'warmup_interval'
+        value: Optional[str] = None
+        try:
+            value = self._config[key]
+            return timedelta(seconds=float(value)) if value else timedelta(seconds=2)
+        except:
+            self._config[key] = ""
+            return timedelta(seconds=2)
+
     #endregion
 
 
@@ -125,16 +352,66 @@ class Audio():
         """
 
         self._config: MutableMapping[str, str] = config        
-        self.player: Player = Player(timeout=self.timeout, tone=self.tone)
+        self.player: Player = Player(timeout=self.timeout, tone=self.tone, prefetch=bool(self.prefetch))
+        self._analyses: Dict[str, asyncio.Task[None]] = dict()
+        self._analysis_slots: asyncio.Semaphore = asyncio.Semaphore(self.analysis_concurrency)
+        self._loudness: Dict[str, Loudness] = dict()
+        self._loudness_loading: Optional[asyncio.Task[None]] = None
+        self._index: HistoryIndex = HistoryIndex()
+        self._indexing: Optional[asyncio.Task[None]] = None
+        self._radio: Optional[Radio] = None
+        self._radio_loading: Optional[asyncio.Task[None]] = None
+        self._radio_interaction: Optional[Interaction] = None
+        self._radio_played: Deque[str] = deque(maxlen=20)
+        self._admission: Admission = Admission(rate=self.admission_rate, burst=self.admission_burst, guild_rate=self.guild_admission_rate, guild_burst=self.guild_admission_burst, backlog=self.admission_backlog)
 
     async def __setup__(self) -> None:
         """
         Called after instance properties are initialized.
         """
 
-        # create database instance
-        self._database: Database = Database(Path(f'./data/{__name__}.db'))
-        self._database.create(Metadata)
+        # create database tables
+        database: Database = Database(Path(f'./data/{__name__}.db'))
+        database.create(Metadata)
+        database.create(Loudness)
+
+        # create asynchronous database instance
+        self._database: AsyncDatabase = AsyncDatabase(Path(f'./data/{__name__}.db'))
+        await self._database.execute(METADATA_INDEX)
+
+        # create the history search index
+        self._history: History = History(self._database)
+        await self._history.create()
+        # create the listening statistics rollups
+        self._statistics: Statistics = Statistics(self._database)
+        await self._statistics.create()
+        # index request history for query autocompletion in the background
+        self._indexing = asyncio.create_task(self._build_index())
+        # persist queues, restoring each guild's journaled requests when it next connects
+        self._journal: QueueJournal = QueueJournal(self._database)
+        await self._journal.create()
+        self._restorable: Set[int] = set(await self._journal.guilds())
+        self.player.journal = self._journal
+        self.player.hydrator = self._hydrate
+        # cache loudness measurements by hyperlink in the background
+        self._loudness_loading = asyncio.create_task(self._load_loudness())
+        # load the radio model in the background if radio mode is enabled
+        if self.radio_mode: self._start_radio()
+
+        # schedule history maintenance if a retention window is configured
+        retention: Optional[timedelta] = self.retention
+        if retention:
+            self._retention: Retention = Retention(self._database, self.archive, window=retention)
+            self._maintenance: asyncio.Task[NoReturn] = asyncio.create_task(self._retention.loop(timedelta(days=1)))
+
+        # trace allocations by request type if memory profiling is enabled
+        if self.profile_memory: PROFILER.enable()
+        # kill playback processes that outlive their requests
+        self._reaper: asyncio.Task[NoReturn] = asyncio.create_task(REGISTRY.loop(timedelta(minutes=1)))
+        # resolve the most requested tracks in the background if warm-up is configured
+        if self.warmup > 0:
+            self._warmup: Warmup = Warmup(self._database, limit=self.warmup, interval=self.warmup_interval)
+            self._warming: asyncio.Task[int] = asyncio.create_task(self._warmup.run(self._warm))
 
         # begin player loop
         await self.player.loop()
@@ -154,11 +431,16 @@ class Audio():
         await interaction.response.defer(ephemeral=False, thinking=True)
 
         try:
-            # connect the player to the channel
-            await self.player.connect(interaction)
+            # wait for admission before starting any work
+            await self._admit(interaction)
 
-            request: FileRequest = FileRequest(interaction, file, before_options=None, after_options=['-b:a', '192k'])
-            await request.parse()
+            request: FileRequest = FileRequest(interaction, file, input_mode=self.attachment_input, before_options=None, after_options=None)
+            # connect the player to the channel while the request is parsed
+            await self._connect(interaction, request)
+            # apply loudness normalization to the request
+            self._normalize(request, request.metadata)
+            # restore the guild's queue from before a restart ahead of the request
+            await self._restore(interaction)
 
             # queue the request
             await self.player.queue(interaction, request)
@@ -166,38 +448,78 @@ class Audio():
             # generate an embed from the song request data
             embed: RequestEmbed = await request.as_embed(interaction)
             # send the embed
-            await followup.send(embed=embed, file=embed.file if embed.file else discord.utils.MISSING)
+            message: discord.WebhookMessage = await followup.send(embed=embed, file=embed.file if embed.file else discord.utils.MISSING, wait=True)
+            # remember the uploaded thumbnail for subsequent embeds
+            embed.cache(message)
 
         except Exception as exception:
             await followup.send(embed=PlaybackExceptionEmbed(exception, user=interaction.client.user))
 
+    async def _complete_query(self, interaction: Interaction, current: str) -> List[Choice[str]]:
+        """
+        Suggests previously requested tracks matching the query.
+        """
+
+        # offer no suggestions until history has been indexed
+        if not self._indexing or not self._indexing.done(): return []
+        # suggest tracks by hyperlink so selecting one skips the search
+        entries: List[IndexEntry] = self._index.search(current)
+        return [Choice(name=str(entry)[:100], value=entry.hyperlink) for entry in entries if len(entry.hyperlink) <= 100]
+
     @describe(query='A URL or video title to search for')
+    @autocomplete(query=_complete_query)
     async def play(self, interaction: Interaction, query: str) -> None:
         """
         Plays audio in a voice channel
         """
 
-        followup: discord.Webhook = interaction.followup
         await interaction.response.defer(ephemeral=False, thinking=True)
+        await self._play(interaction, query)
+
+    async def _play(self, interaction: Interaction, query: str) -> None:
+        """
+        Queues a query for playback and responds to the deferred interaction.
+        """
+
+        followup: discord.Webhook = interaction.followup
 
         try:
-            # connect the player to the channel
-            await self.player.connect(interaction)
+            # wait for admission before starting any work
+            await self._admit(interaction)
 
             # create a request from the provided query
             request: YouTubeRequest = YouTubeRequest(interaction, query, before_options=self.before_options, after_options=self.after_options)
-            await request.parse()
+            # connect the player to the channel while the request is parsed
+            await self._connect(interaction, request)
+            # get the request's metadata
+            metadata: Metadata = request.metadata
+            # apply loudness normalization to the request
+            self._normalize(request, metadata)
+            # restore the guild's queue from before a restart ahead of the request
+            await self._restore(interaction)
 
             # queue the request
             await self.player.queue(interaction, request)
 
-            # insert metadata into database
-            self._database.insert(Metadata, request.metadata)
-
             # generate an embed from the song request data
             embed: RequestEmbed = await request.as_embed(interaction)
             # send the embed
-            await followup.send(embed=embed, file=embed.file if embed.file else discord.utils.MISSING)
+            message: discord.WebhookMessage = await followup.send(embed=embed, file=embed.file if embed.file else discord.utils.MISSING, wait=True)
+            # remember the uploaded thumbnail for subsequent embeds
+            embed.cache(message)
+
+            # insert metadata into database once the response is sent, moving it to a free id if a batch took its own
+            metadata.id, = await self._database.insertunique('Metadata', [metadata.__values__()])
+            # count the request in the listening statistics
+            await self._statistics.record(metadata, interaction.guild_id)
+            # attribute radio requests to a recent user if radio mode was enabled by configuration
+            if self._radio_interaction is None: self._radio_interaction = interaction
+            # count the request in the radio model, which holds it back until history has loaded
+            if self._radio:
+                self._radio.observe(metadata, interaction.guild_id)
+                await self._radio.checkpoint()
+            # add metadata to the autocomplete index
+            self._index.add(metadata)
 
         except Exception as exception:
             await followup.send(embed=PlaybackExceptionEmbed(exception, user=interaction.client.user))
@@ -213,8 +535,13 @@ class Audio():
         await interaction.response.defer(ephemeral=False, thinking=True)
 
         try:
+            # wait for admission before starting any work
+            await self._admit(interaction)
+
             # connect the player to the channel
             await self.player.connect(interaction)
+            # restore the guild's queue from before a restart ahead of the request
+            await self._restore(interaction)
 
             request: Request = MidiRequest(interaction, midi, sf2=sf2)
 
@@ -224,7 +551,95 @@ class Audio():
             # generate an embed from the song request data
             embed: RequestEmbed = await request.as_embed(interaction)
             # send the embed
-            await followup.send(embed=embed, file=embed.file if embed.file else discord.utils.MISSING)
+            message: discord.WebhookMessage = await followup.send(embed=embed, file=embed.file if embed.file else discord.utils.MISSING, wait=True)
+            # remember the uploaded thumbnail for subsequent embeds
+            embed.cache(message)
+
+        except Exception as exception:
+            await followup.send(embed=PlaybackExceptionEmbed(exception, user=interaction.client.user))
+
+    @describe(queries='URLs or video titles to search for, one per line or separated by semicolons')
+    @describe(first='An audio file to queue after the queries')
+    @describe(second='Another audio file to queue')
+    @describe(third='Another audio file to queue')
+    async def bulk(self, interaction: Interaction, queries: Optional[str] = None, first: Optional[discord.Attachment] = None, second: Optional[discord.Attachment] = None, third: Optional[discord.Attachment] = None) -> None:
+        """
+        Plays several queries or audio files in a voice channel
+        """
+
+        followup: discord.Webhook = interaction.followup
+        await interaction.response.defer(ephemeral=False, thinking=True)
+
+        try:
+            # most clients enter options on a single line, so semicolons also separate queries
+            lines: List[str] = [line.strip() for line in re.split(r'[\n;]', queries) if line.strip()] if queries else []
+            attachments: List[discord.Attachment] = [attachment for attachment in (first, second, third) if attachment]
+            if not lines and not attachments: raise AudioError('Provide at least one query or file.')
+            if len(lines) + len(attachments) > self.bulk_limit: raise AudioError(f'Up to {self.bulk_limit} tracks can be queued at once.')
+
+            # the requests share an interaction, so offset its snowflake to give each its own id,
+            # which the history insert moves to a free id should another request already have it
+            requests: List[Union[YouTubeRequest, FileRequest]] = [
+                YouTubeRequest(interaction, line, metadata=Metadata(interaction.id + index, user_id=interaction.user.id, title=line), before_options=self.before_options, after_options=self.after_options)
+                for index, line in enumerate(lines)
+            ] + [
+                FileRequest(interaction, attachment, metadata=Metadata(interaction.id + len(lines) + index, user_id=interaction.user.id, title=attachment.filename, hyperlink=attachment.url), input_mode=self.attachment_input)
+                for index, attachment in enumerate(attachments)
+            ]
+
+            acknowledged: bool = False
+            async def acknowledge(delay: float) -> None:
+                # let the user know once, rather than for every delayed request
+                nonlocal acknowledged
+                if acknowledged: return
+                acknowledged = True
+                await followup.send(f'Busy right now. Some of your requests will be handled in about {delay:.0f} seconds.')
+
+            # resolve the requests concurrently, each admitted separately so a batch cannot bypass rate limits
+            semaphore: asyncio.Semaphore = asyncio.Semaphore(self.bulk_concurrency)
+            tasks: List[asyncio.Task[None]] = [asyncio.create_task(self._resolve(interaction, request, semaphore, acknowledge)) for request in requests]
+
+            queued: List[Union[YouTubeRequest, FileRequest]] = []
+            failed: List[Tuple[str, str]] = []
+            try:
+                # connect the player to the channel while the requests are resolved
+                await self.player.connect(interaction)
+                # restore the guild's queue from before a restart ahead of the requests
+                await self._restore(interaction)
+
+                # queue each request once it and every request before it have resolved, keeping submission order
+                for request, task in zip(requests, tasks):
+                    try:
+                        await task
+                    except Exception as exception:
+                        failed.append((request.metadata.title if request.metadata.title else 'Unknown Title', f'{exception}'))
+                        continue
+                    await self.player.queue(interaction, request)
+                    queued.append(request)
+            finally:
+                # stop resolving requests that will not be queued
+                for task in tasks: task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+            # generate a single embed summarizing the batch
+            embed: discord.Embed = RequestBulkEmbed(interaction, [request.metadata for request in queued], failed)
+            # send the embed
+            await followup.send(embed=embed)
+
+            # insert metadata into database in one batch once the response is sent, moving any colliding ids to free ones
+            history: List[Metadata] = [request.metadata for request in queued if isinstance(request, YouTubeRequest)]
+            ids: List[int] = await self._database.insertunique('Metadata', [metadata.__values__() for metadata in history])
+            for metadata, id in zip(history, ids): metadata.id = id
+            # count the requests in the listening statistics
+            await self._statistics.recordmany(history, interaction.guild_id)
+            # attribute radio requests to a recent user if radio mode was enabled by configuration
+            if self._radio_interaction is None: self._radio_interaction = interaction
+            # count the requests in the radio model, which holds them back until history has loaded
+            if self._radio and history:
+                for metadata in history: self._radio.observe(metadata, interaction.guild_id)
+                await self._radio.checkpoint()
+            # add metadata to the autocomplete index
+            for metadata in history: self._index.add(metadata)
 
         except Exception as exception:
             await followup.send(embed=PlaybackExceptionEmbed(exception, user=interaction.client.user))
@@ -252,12 +667,31 @@ class Audio():
             for item in queue: embed.add_field(name=item.title, value=item.artist, inline=False)
 
             # send the embed
-            await followup.send(embed=embed, file=embed.file if embed.file else discord.utils.MISSING)
+            message: discord.WebhookMessage = await followup.send(embed=embed, file=embed.file if embed.file else discord.utils.MISSING, wait=True)
+            # remember the uploaded thumbnail for subsequent embeds
+            embed.cache(message)
 
         except AudioError as exception:
             await followup.send(f'{exception}')
             raise
 
+    @describe(enabled='Whether to keep playing related tracks when the queue runs out.')
+    async def radio(self, interaction: discord.Interaction, enabled: bool) -> None:
+        """
+        Toggles playing related tracks from request history when the queue runs out
+        """
+
+        await interaction.response.defer(ephemeral=False, thinking=True)
+
+        # store the setting
+        self.radio_mode = enabled
+        # attribute radio requests to the user that enabled radio mode
+        self._radio_interaction = interaction if enabled else None
+        if enabled: self._start_radio()
+        else: self._stop_radio()
+
+        await interaction.followup.send('Radio mode enabled.' if enabled else 'Radio mode disabled.')
+
     async def skip(self, interaction: discord.Interaction) -> None:
         """
         Skips the currently playing song
@@ -271,6 +705,9 @@ class Audio():
             current: Optional[Request] = self.player.current
             # get the metadata of the request
             metadata: Optional[Metadata] = current.metadata if current else None
+            # a request that is still being processed is not playing yet, but skipping cancels it
+            processing: Optional[QueueEntry] = self.player.processing
+            if metadata is None and processing: metadata = processing.metadata
 
             # skip the song
             await self.player.skip(interaction)
@@ -284,8 +721,44 @@ class Audio():
             await followup.send(f'{exception}')
             raise
 
+    # the bot framework registers each component method as a top-level command, so history search is /history rather than a /history search subcommand
+    @describe(query='The title, artist or URL to search your request history for')
+    @describe(page='The page of results to display')
+    async def history(self, interaction: discord.Interaction, query: str, page: int = 1) -> None:
+        """
+        Searches request history and allows results to be requeued
+        """
+
+        followup: discord.Webhook = interaction.followup
+        await interaction.response.defer(ephemeral=False, thinking=True)
+
+        # search the history for the query
+        results: List[Metadata] = await self._history.search(query, page=page)
+
+        # if no results are found
+        if len(results) == 0:
+            await followup.send('No matching requests found.')
+            return
+
+        # generate an embed from the search results
+        embed: discord.Embed = RequestSearchEmbed(interaction, query, results, page)
+        # allow a result to be requeued, unless none has a hyperlink to requeue, as a select menu needs an option
+        view: Union[RequeueView, Any] = RequeueView(results, self._requeue) if any(result.hyperlink for result in results) else discord.utils.MISSING
+        # send the embed
+        await followup.send(embed=embed, view=view)
+
+    async def _requeue(self, interaction: discord.Interaction, hyperlink: str) -> None:
+        """
+        Requeues a track selected from request history.
+        """
+
+        await interaction.response.defer(ephemeral=False, thinking=True)
+        await self._play(interaction, hyperlink)
+
     @describe(user='The user to calculate most frequent song requests for.')
-    async def top(self, interaction: discord.Interaction, user: Optional[discord.User] = None) -> None:
+    @describe(period='The time period to calculate most frequent song requests over.')
+    @describe(server='Whether to calculate most frequent song requests for the whole server.')
+    async def top(self, interaction: discord.Interaction, user: Optional[discord.User] = None, period: Literal['week', 'month', 'all'] = 'all', server: bool = False) -> None:
         """
         Displays your most frequent song requests
         """
@@ -293,21 +766,47 @@ class Audio():
         followup: discord.Webhook = interaction.followup
         await interaction.response.defer(ephemeral=False, thinking=True)
 
-        # get the user's ID
-        user_id: int = user.id if user else interaction.user.id
-        # get the user's stored metadata
-        results: List[Metadata] = [metadata for metadata in self._database.select(Metadata) if metadata.user_id == user_id]
-
-        videos: Dict[str, Metadata] = { metadata.title : metadata for metadata in results if metadata.title }
-        counted = Counter(metadata.title for metadata in results if metadata.title)
-        top: Sequence[Tuple[str, int]]= counted.most_common(5)
-        output: List[Tuple[Metadata, int]] = [(videos[entry], count) for entry, count in top]
+        # if server-wide statistics were requested
+        if server and interaction.guild_id:
+            output: List[Tuple[Metadata, int]] = await self._statistics.top('guild', interaction.guild_id, period)
+        else:
+            # get the user's ID
+            user_id: int = user.id if user else interaction.user.id
+            # get the user's most frequently requested tracks
+            output: List[Tuple[Metadata, int]] = await self._statistics.top('user', user_id, period)
 
         # generate an embed from the song request data
         embed: discord.Embed = RequestFrequencyEmbed(interaction, output)
         # send the embed
         await followup.send(embed=embed)
 
+    @default_permissions(administrator=True)
+    async def processes(self, interaction: discord.Interaction) -> None:
+        """
+        Displays the playback processes that are running and their resource usage
+        """
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
+        # generate an embed from a sample of every running process
+        embed: discord.Embed = ProcessStatsEmbed(interaction, REGISTRY.usage())
+        # send the embed
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+    @describe(top='The number of allocation sites to list for each request type.')
+    @default_permissions(administrator=True)
+    async def memory(self, interaction: discord.Interaction, top: int = 5) -> None:
+        """
+        Displays peak memory use and top allocation sites by request type
+        """
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
+        # generate an embed from the profiler's rolling summary
+        embed: discord.Embed = MemoryProfileEmbed(interaction, PROFILER.summary(top=top), enabled=PROFILER.enabled)
+        # send the embed
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
     @describe(user='The user to calculate most recent song requests for.')
     async def recent(self, interaction: discord.Interaction, user: Optional[discord.User] = None) -> None:
         """
@@ -319,16 +818,14 @@ class Audio():
 
         # get the user's ID
         user_id: int = user.id if user else interaction.user.id
-        # get the user's stored metadata
-        results: List[Metadata] = [metadata for metadata in self._database.select(Metadata) if metadata.user_id == user_id]
+        # get the user's most recent requests (id is a snowflake timestamp)
+        results: List[Metadata] = [Metadata.__from_row__(row) async for row in self._database.stream(SELECT_RECENT, (user_id, 5))]
 
         # if no results are found
         if len(results) == 0:
             await followup.send('No recent requests found.')
             return
 
-        # sort the results by id, descending (id is a snowflake timestamp)
-        results = sorted(results, key=lambda result: result.id, reverse=True)[:5]
         # map each result to a tuple containing the timestamp
         output: List[Tuple[Metadata, datetime]] = [(result, discord.utils.snowflake_time(result.id)) for result in results]
 
@@ -340,6 +837,249 @@ class Audio():
     #endregion
 
 
+    #region Database Access
+
+    async def _stream(self, type: Type[StorableType], sql: str, parameters: Tuple[Any, ...] = ()) -> AsyncIterator[StorableType]:
+        """
+        Yields rows of a query lazily as instances of a storable type.
+        """
+
+        async for row in self._database.stream(sql, parameters):
+            yield type.__from_row__(row) # type: ignore
+
+    async def _build_index(self) -> None:
+        """
+        Adds request history to the autocomplete index.
+        """
+
+        # requests made while indexing are added as they are made, so only index those before it started
+        row: Optional[sqlite3.Row] = await self._database.fetchone('SELECT MAX(ID) FROM Metadata')
+        latest: int = row[0] if row and row[0] is not None else 0
+        async for item in self._stream(Metadata, SELECT_SUMMARIES, (latest,)): self._index.add(item)
+        log.info(f'Indexed {len(self._index)} tracks for autocompletion')
+
+    #endregion
+
+
+    #region Request Preparation
+
+    async def _connect(self, interaction: Interaction, request: Union[YouTubeRequest, FileRequest]) -> None:
+        """
+        Connects the player to the interaction's channel while the request is parsed, abandoning the parse if connecting fails.
+        """
+
+        parsing: asyncio.Task[None] = asyncio.create_task(self._parse(request))
+        try:
+            await self.player.connect(interaction)
+        except BaseException:
+            # do not spend an extraction on a request that has already been rejected
+            parsing.cancel()
+            await asyncio.gather(parsing, return_exceptions=True)
+            raise
+        await parsing
+
+    #endregion
+
+
+    #region Memory Profiling
+
+    async def _parse(self, request: Union[YouTubeRequest, FileRequest]) -> None:
+        """
+        Parses a request, profiling its memory use if enabled.
+        """
+
+        async with PROFILER.profile(type(request).__name__, 'parse'):
+            await request.parse()
+
+    #endregion
+
+
+    #region Bulk Requests
+
+    async def _resolve(self, interaction: Interaction, request: Union[YouTubeRequest, FileRequest], semaphore: asyncio.Semaphore, acknowledge: Callable[[float], Awaitable[None]]) -> None:
+        """
+        Admits and parses one request of a batch, bounded by the batch's semaphore.
+        """
+
+        async with semaphore:
+            await self._admission.admit(interaction.guild_id, acknowledge)
+            await self._parse(request)
+            # apply loudness normalization to the request
+            self._normalize(request, request.metadata)
+
+    #endregion
+
+
+    #region Admission Control
+
+    async def _admit(self, interaction: Interaction) -> None:
+        """
+        Waits until the interaction's request may proceed, letting the user know if it must wait.
+        """
+
+        async def acknowledge(delay: float) -> None:
+            await interaction.followup.send(f'Busy right now. Your request will be handled in about {delay:.0f} seconds.')
+
+        await self._admission.admit(interaction.guild_id, acknowledge)
+
+    #endregion
+
+
+    #region Queue Entries
+
+    async def _restore(self, interaction: Interaction) -> None:
+        """
+        Queues the requests journaled for the interaction's guild before a restart, once per guild.
+        """
+
+        guild_id: Optional[int] = interaction.guild_id
+        if guild_id is None or guild_id not in self._restorable: return
+        self._restorable.discard(guild_id)
+
+        # restored entries are rebuilt when played, so a restart does not re-extract every queue at once
+        entries: List[QueueEntry] = await self._journal.take(guild_id)
+        for entry in entries: await self.player.queue(interaction, entry)
+
+    def _hydrate(self, entry: QueueEntry) -> Request:
+        """
+        Rebuilds the request of a compacted or restored queue entry.
+        """
+
+        request: Union[YouTubeRequest, FileRequest]
+        if entry.kind == 'youtube':
+            request = YouTubeRequest(None, entry.source, metadata=entry.metadata, start=entry.start, before_options=self.before_options, after_options=self.after_options)
+        elif entry.kind == 'file':
+            request = FileRequest(None, entry.source, metadata=entry.metadata, start=entry.start, input_mode=self.attachment_input)
+        else:
+            raise AudioError(f'Cannot restore queued request {entry.title}')
+
+        # reuse the gain applied when the request was queued, otherwise look it up again
+        if entry.gain is not None: request.gain = entry.gain
+        else: self._normalize(request, request.metadata)
+        return request
+
+    #endregion
+
+
+    #region Cache Warm-up
+
+    async def _warm(self, hyperlink: str) -> None:
+        """
+        Resolves a track so its extraction and thumbnail are cached for the next request.
+        """
+
+        # the request is never queued, so its metadata is a placeholder
+        request: YouTubeRequest = YouTubeRequest(None, hyperlink, metadata=Metadata(0, hyperlink=hyperlink), before_options=self.before_options, after_options=self.after_options)
+        await request.parse()
+
+    #endregion
+
+
+    #region Radio Mode
+
+    def _start_radio(self) -> None:
+        """
+        Loads the radio model in the background and enables autoplay.
+        """
+
+        if self._radio is None:
+            self._radio = Radio(Path('./data/radio.npz'))
+            self._radio_loading = asyncio.create_task(self._radio.load(self._database))
+        self.player.autoplay = self._autoplay
+
+    def _stop_radio(self) -> None:
+        """
+        Disables autoplay.
+        """
+
+        self.player.autoplay = None
+
+    async def _autoplay(self, previous: Request) -> Optional[Request]:
+        """
+        Picks a request for the track that most often follows the previous one.
+        """
+
+        # return if the model is unavailable or not loaded
+        if self._radio is None or not self._radio_loading or not self._radio_loading.done(): return None
+        # return if the previous request cannot be identified
+        if not previous.metadata.hyperlink: return None
+
+        self._radio_played.append(previous.metadata.hyperlink)
+        hyperlink: Optional[str] = self._radio.next(previous.metadata.hyperlink, exclude=self._radio_played)
+        if hyperlink is None: return None
+
+        # resolve the track directly by hyperlink, without a search
+        interaction: Optional[Interaction] = self._radio_interaction
+        if interaction is None: return None
+        # give each pick its own id, as the interaction it is attributed to was used by an earlier request
+        id: int = max(discord.utils.time_snowflake(discord.utils.utcnow()), previous.metadata.id + 1)
+        metadata: Metadata = Metadata(id, user_id=interaction.user.id, title=hyperlink, hyperlink=hyperlink)
+        return YouTubeRequest(None, hyperlink, metadata=metadata, before_options=self.before_options, after_options=self.after_options)
+
+    #endregion
+
+
+    #region Loudness Normalization
+
+    def _normalize(self, request: Union[YouTubeRequest, FileRequest], metadata: Metadata) -> None:
+        """
+        Applies a normalization gain to the request from its cached loudness, scheduling analysis if unknown.
+        """
+
+        # return if normalization is disabled
+        target: Optional[float] = self.loudness
+        if target is None: return
+        # return if the request cannot be identified
+        if not metadata.hyperlink: return
+
+        # prefer loudness found in the request's tags, otherwise use the cached measurement
+        loudness: Optional[Loudness] = metadata.loudness if metadata.loudness else self._loudness.get(metadata.hyperlink)
+        if loudness:
+            request.gain = loudness.gain(target)
+            log.debug(f'Applying {request.gain:.2f}dB gain to {metadata.title}')
+            return
+
+        # return while measurements are loading, as the track may already have been measured
+        if not self._loudness_loading or not self._loudness_loading.done(): return
+        # return if the media cannot be analyzed or is already being analyzed
+        if not metadata.media_url: return
+        if metadata.hyperlink in self._analyses: return
+        # skip analysis while too many tracks are waiting to be analyzed, as it can be repeated on a later request
+        if len(self._analyses) >= self.analysis_backlog:
+            log.debug(f'Skipping loudness analysis of {metadata.title} with {len(self._analyses)} analyses pending')
+            return
+
+        # measure the track's loudness in the background for subsequent requests
+        task: asyncio.Task[None] = asyncio.create_task(self._analyze(metadata.hyperlink, metadata.media_url))
+        self._analyses[metadata.hyperlink] = task
+        task.add_done_callback(lambda _: self._analyses.pop(metadata.hyperlink, None)) # type: ignore
+
+    async def _load_loudness(self) -> None:
+        """
+        Caches stored loudness measurements by hyperlink.
+        """
+
+        async for loudness in self._stream(Loudness, 'SELECT * FROM Loudness'): self._loudness.setdefault(loudness.hyperlink, loudness)
+        log.info(f'Loaded {len(self._loudness)} loudness measurements')
+
+    async def _analyze(self, hyperlink: str, source: str) -> None:
+        """
+        Measures and stores the loudness of a track.
+        """
+
+        try:
+            # each analysis downloads and decodes a whole track, so bound how many run alongside playback
+            async with self._analysis_slots:
+                loudness: Loudness = await analyze(hyperlink, source)
+            log.debug(f'Measured loudness {loudness}')
+            self._loudness[hyperlink] = loudness
+            await self._database.insert('Loudness', loudness.__values__())
+        except Exception as exception:
+            log.warning(f'Could not measure loudness of {hyperlink}: {exception}')
+
+    #endregion
+
+
     #region Client Activity State Management
 
     async def __update_activity__(self, client: discord.VoiceClient, metadata: Optional[Metadata]):
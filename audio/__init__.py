@@ -1,10 +1,30 @@
-from .embed import (RequestEmbed, RequestFrequencyEmbed, RequestQueueEmbed,
-                    RequestRecentEmbed)
-from .error import AudioError, InvalidChannelException, NotConnectedError
-from .metadata import Metadata
+from .admission import Admission, TokenBucket
+from .cache import Backoff, Failure, FailureCache, ResultCache
+from .database import AsyncDatabase
+from .embed import (MemoryProfileEmbed, ProcessStatsEmbed, RequestBulkEmbed, RequestEmbed,
+                    RequestFrequencyEmbed, RequestQueueEmbed,
+                    RequestRecentEmbed, RequestSearchEmbed)
+from .entry import QueueEntry
+from .error import (AudioError, BackoffError, CachedFailureError, OverloadedError,
+                    InvalidChannelException, NotConnectedError)
+from .history import History
+from .index import HistoryIndex, IndexEntry
+from .journal import QueueJournal
+from .loudness import Loudness, analyze
+from .metadata import (METADATA_INDEX, SELECT_RECENT, SELECT_SUMMARIES,
+                       Metadata)
 from .request import FileRequest, MidiRequest, Request, YouTubeRequest
 from .player import Player, PlaybackExceptionEmbed
+from .pool import DownloaderPool
+from .processes import REGISTRY, ProcessRegistry, ProcessUsage
+from .profiling import PROFILER, MemoryProfiler, MemorySummary
 from .queue import Queue
+from .radio import Radio
+from .retention import Retention
+from .statistics import Statistics
+from .thumbnail import ThumbnailFormat, default_thumbnail, detect, encode
+from .view import RequeueView
+from .warmup import Warmup
 
 
 from logging import Logger
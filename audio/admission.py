@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+from logging import Logger
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+
+from .error import OverloadedError
+
+log: Logger = logging.getLogger(__name__)
+
+
+class TokenBucket():
+    """
+    A token bucket that refills continuously up to its capacity.
+
+    A bucket with a rate of zero or less is unlimited.
+    """
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        """
+        Initialize a full bucket refilling at the provided rate in tokens per second.
+        """
+
+        self._rate: float = rate
+        """The number of tokens added per second."""
+
+        self._capacity: int = max(capacity, 1)
+        """The maximum number of tokens held, at least one so a token can become available."""
+
+        self._tokens: float = self._capacity
+        """The number of tokens currently held."""
+
+        self._updated: float = time.monotonic()
+        """The monotonic time the token count was last refilled."""
+
+    def delay(self) -> float:
+        """
+        Get the number of seconds until a token is available.
+        """
+
+        if self._rate <= 0: return 0
+        self._refill()
+        return 0 if self._tokens >= 1 else (1 - self._tokens) / self._rate
+
+    def take(self) -> None:
+        """
+        Remove a token. The caller must check a token is available first.
+        """
+
+        if self._rate <= 0: return
+        self._refill()
+        self._tokens -= 1
+
+    def _refill(self) -> None:
+        now: float = time.monotonic()
+        self._tokens = min(self._tokens + (now - self._updated) * self._rate, self._capacity)
+        self._updated = now
+
+
+class Admission():
+    """
+    Admission control for playback requests, rate limited globally and per guild.
+
+    Requests that arrive while either bucket is empty wait their turn, up to a
+    hard cap of waiting requests, beyond which they are rejected.
+    """
+
+    def __init__(self, *, rate: float, burst: int, guild_rate: float, guild_burst: int, backlog: int) -> None:
+        """
+        Initialize admission control with the provided rates in requests per second, burst sizes and waiting request cap.
+        """
+
+        self._bucket: TokenBucket = TokenBucket(rate, burst)
+        """The bucket shared by every guild."""
+
+        self._guild_rate: float = guild_rate
+        """The rate each guild's bucket refills at."""
+
+        self._guild_burst: int = guild_burst
+        """The capacity of each guild's bucket."""
+
+        self._guilds: Dict[Hashable, TokenBucket] = dict()
+        """The bucket of each guild."""
+
+        self._backlog: int = backlog
+        """The maximum number of requests waiting for admission."""
+
+        self._waiting: int = 0
+        """The number of requests waiting for admission."""
+
+    async def admit(self, guild_id: Optional[Hashable], acknowledge: Optional[Callable[[float], Awaitable[None]]] = None) -> None:
+        """
+        Wait until a request may proceed, acknowledging it with the expected delay if it must wait.
+        Raises OverloadedError if too many requests are already waiting.
+        """
+
+        guild: TokenBucket = self._guilds.setdefault(guild_id, TokenBucket(self._guild_rate, self._guild_burst))
+
+        delay: float = max(self._bucket.delay(), guild.delay())
+        if delay > 0:
+            if self._waiting >= self._backlog: raise OverloadedError()
+
+            self._waiting += 1
+            try:
+                log.info(f'Delaying request from guild {guild_id} by {delay:.1f} seconds')
+                if acknowledge: await acknowledge(delay)
+                # tokens may be taken by other waiters, so wait until both buckets have one
+                while delay > 0:
+                    await asyncio.sleep(delay)
+                    delay = max(self._bucket.delay(), guild.delay())
+            finally:
+                self._waiting -= 1
+
+        self._bucket.take()
+        guild.take()
@@ -0,0 +1,205 @@
+import logging
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from logging import Logger
+from typing import Dict, Generic, Iterable, List, NamedTuple, Optional, Tuple, TypeVar
+
+log: Logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class Failure(NamedTuple):
+    """
+    A remembered extraction failure.
+    """
+
+    reason: str
+    """The class of error that occurred."""
+
+    message: str
+    """The error message."""
+
+    expires: float
+    """The monotonic time the failure is forgotten at."""
+
+
+class FailureCache():
+    """
+    A bounded, expiring cache of failed extractions.
+    """
+
+    def __init__(self, *, capacity: int = 4096) -> None:
+        """
+        Initialize an empty cache holding up to the provided number of failures.
+        """
+
+        self._capacity: int = capacity
+        """The maximum number of failures remembered."""
+
+        self._failures: OrderedDict[str, Failure] = OrderedDict()
+        """The remembered failures by key, least recently stored first."""
+
+    def __len__(self) -> int:
+        return len(self._failures)
+
+    def get(self, key: str) -> Optional[Failure]:
+        """
+        Get the unexpired failure for a key, if any.
+        """
+
+        failure: Optional[Failure] = self._failures.get(key, None)
+        if failure is None: return None
+        if failure.expires <= time.monotonic():
+            del self._failures[key]
+            return None
+        return failure
+
+    def put(self, keys: Iterable[str], message: str) -> Failure:
+        """
+        Remember a failure under each of the provided keys, for as long as its class of error warrants.
+        """
+
+        reason: str = classify(message)
+        failure: Failure = Failure(reason, message, time.monotonic() + TTL[reason].total_seconds())
+        for key in keys:
+            log.debug(f'Caching {reason} failure for {key}')
+            self._failures[key] = failure
+            self._failures.move_to_end(key)
+        # evict the least recently stored failures
+        while len(self._failures) > self._capacity: self._failures.popitem(last=False)
+        return failure
+
+
+class ResultCache(Generic[T]):
+    """
+    A bounded, expiring cache of successful results.
+    """
+
+    def __init__(self, *, capacity: int, ttl: timedelta) -> None:
+        """
+        Initialize an empty cache holding up to the provided number of results for the provided duration.
+        """
+
+        self._capacity: int = capacity
+        """The maximum number of results remembered."""
+
+        self._ttl: timedelta = ttl
+        """How long a result is remembered."""
+
+        self._results: OrderedDict[str, Tuple[T, float]] = OrderedDict()
+        """The remembered results and their expiry by key, least recently used first."""
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def get(self, key: str) -> Optional[T]:
+        """
+        Get the unexpired result for a key, if any.
+        """
+
+        result: Optional[Tuple[T, float]] = self._results.get(key, None)
+        if result is None: return None
+        value, expires = result
+        if expires <= time.monotonic():
+            del self._results[key]
+            return None
+        self._results.move_to_end(key)
+        return value
+
+    def put(self, keys: Iterable[str], value: T) -> None:
+        """
+        Remember a result under each of the provided keys.
+        """
+
+        expires: float = time.monotonic() + self._ttl.total_seconds()
+        for key in keys:
+            self._results[key] = (value, expires)
+            self._results.move_to_end(key)
+        # evict the least recently used results
+        while len(self._results) > self._capacity: self._results.popitem(last=False)
+
+
+class Backoff():
+    """
+    Exponential backoff per domain for failures that suggest the domain is refusing requests.
+    """
+
+    def __init__(self, *, base: float = 2, maximum: float = 600) -> None:
+        """
+        Initialize backoff with the provided initial and maximum delays in seconds.
+        """
+
+        self._base: float = base
+        """The delay in seconds after the first failure."""
+
+        self._maximum: float = maximum
+        """The longest delay in seconds."""
+
+        self._domains: Dict[str, Tuple[int, float]] = dict()
+        """The consecutive failure count and retry time of each domain in backoff."""
+
+    def remaining(self, domain: str) -> float:
+        """
+        Get the number of seconds before the domain may be retried.
+        """
+
+        _, retry = self._domains.get(domain, (0, 0.0))
+        return max(retry - time.monotonic(), 0)
+
+    def failure(self, domain: str) -> None:
+        """
+        Record a failure, doubling the domain's delay.
+        """
+
+        count, _ = self._domains.get(domain, (0, 0.0))
+        delay: float = min(self._base * 2 ** count, self._maximum)
+        log.warning(f'Backing off {domain} for {delay:.0f} seconds after {count + 1} consecutive failures')
+        self._domains[domain] = (count + 1, time.monotonic() + delay)
+
+    def success(self, domain: str) -> None:
+        """
+        Record a success, clearing the domain's delay.
+        """
+        self._domains.pop(domain, None)
+
+
+def classify(message: str) -> str:
+    """
+    Classify an error message by the kind of failure it describes.
+    """
+
+    lowered: str = message.lower()
+    for reason, patterns in PATTERNS:
+        if any(pattern in lowered for pattern in patterns): return reason
+    # unrecognized errors are usually specific to the requested video, so they do not implicate the domain
+    return 'unknown'
+
+
+PATTERNS: List[Tuple[str, List[str]]] = [
+    ('throttled', ['http error 429', 'too many requests', 'confirm you’re not a bot', "confirm you're not a bot", 'not a bot']),
+    ('network', ['timed out', 'connection reset', 'connection refused', 'connection aborted', 'remote end closed connection', 'name resolution', 'network is unreachable', 'http error 500', 'http error 502', 'http error 503', 'http error 504']),
+    ('geo', ['available in your country', 'geo restrict', 'geo-restrict']),
+    ('age', ['confirm your age', 'age-restricted', 'inappropriate for some users']),
+    ('unavailable', ['video unavailable', 'private video', 'has been removed', 'does not exist', 'has been terminated', 'unsupported url', 'members-only', 'music premium']),
+    ('no_results', ['no results found']),
+]
+"""Message fragments identifying each class of error, checked in order."""
+
+TTL: Dict[str, timedelta] = {
+    'throttled': timedelta(minutes=1),
+    'geo': timedelta(hours=6),
+    'age': timedelta(hours=6),
+    'unavailable': timedelta(hours=6),
+    'no_results': timedelta(minutes=10),
+    'network': timedelta(minutes=1),
+    'unknown': timedelta(minutes=1),
+}
+"""How long a failure of each class of error is remembered."""
+
+BACKOFF_REASONS: List[str] = ['throttled', 'network']
+"""The classes of error that put a domain into backoff."""
+
+VIDEO_REASONS: List[str] = ['geo', 'age', 'unavailable']
+"""The classes of error that are remembered for the resolved video as well as the query."""
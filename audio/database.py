@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from logging import Logger
+from os import PathLike
+from typing import Any, AsyncIterator, Callable, Iterable, List, Optional, Sequence, TypeVar
+
+log: Logger = logging.getLogger(__name__)
+
+ResultType = TypeVar('ResultType')
+
+
+class AsyncDatabase():
+    """
+    An asynchronous facade over a SQLite database.
+
+    Every statement runs on a dedicated connection thread, so database access
+    never blocks the event loop. Statements are cached by their SQL text, so
+    reusing the same SQL string reuses its prepared statement.
+    """
+
+    def __init__(self, path: PathLike[str], *, cached_statements: int = 256) -> None:
+        """
+        Initialize the facade for the database at the provided path. The connection is opened on first use.
+        """
+
+        self._path: PathLike[str] = path
+        """The path of the database file."""
+
+        self._cached_statements: int = cached_statements
+        """The number of prepared statements the connection caches."""
+
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='AsyncDatabase')
+        """The executor owning the connection thread."""
+
+        self._connection: Optional[sqlite3.Connection] = None
+        """The connection, owned by the connection thread."""
+
+    @property
+    def path(self) -> PathLike[str]:
+        """The path of the database file."""
+        return self._path
+
+    async def execute(self, sql: str, parameters: Sequence[Any] = ()) -> int:
+        """
+        Execute a statement in its own transaction, returning the number of modified rows.
+        """
+        return await self._run(_execute, sql, parameters)
+
+    async def executemany(self, sql: str, parameters: Iterable[Sequence[Any]]) -> int:
+        """
+        Execute a statement for each set of parameters in a single transaction, returning the number of modified rows.
+        """
+        return await self._run(_executemany, sql, list(parameters))
+
+    async def executescript(self, script: str) -> None:
+        """
+        Execute a script of statements.
+        """
+        return await self._run(_executescript, script)
+
+    async def fetchone(self, sql: str, parameters: Sequence[Any] = ()) -> Optional[sqlite3.Row]:
+        """
+        Execute a query and return the first row, if any.
+        """
+        return await self._run(_fetchone, sql, parameters)
+
+    async def fetchall(self, sql: str, parameters: Sequence[Any] = ()) -> List[sqlite3.Row]:
+        """
+        Execute a query and return every row.
+        """
+        return await self._run(_fetchall, sql, parameters)
+
+    async def stream(self, sql: str, parameters: Sequence[Any] = (), *, size: int = 256) -> AsyncIterator[sqlite3.Row]:
+        """
+        Execute a query and yield its rows lazily, fetching them in batches of the provided size.
+        """
+
+        cursor: sqlite3.Cursor = await self._run(_cursor, sql, parameters)
+        try:
+            while True:
+                rows: List[sqlite3.Row] = await self._run(lambda _, count: cursor.fetchmany(count), size)
+                if not rows: break
+                for row in rows: yield row
+        finally:
+            await self._run(lambda _: cursor.close())
+
+    async def insert(self, table: str, values: Sequence[Any]) -> None:
+        """
+        Insert a row of values into a table.
+        """
+        await self.execute(f'INSERT INTO {table} VALUES ({", ".join("?" for _ in values)})', values)
+
+    async def insertmany(self, table: str, values: Sequence[Sequence[Any]]) -> None:
+        """
+        Insert rows of values into a table in a single transaction.
+        """
+        if not values: return
+        await self.executemany(f'INSERT INTO {table} VALUES ({", ".join("?" for _ in values[0])})', values)
+
+    async def insertunique(self, table: str, values: Sequence[Sequence[Any]]) -> List[int]:
+        """
+        Insert rows keyed by an integer primary key in a single transaction, returning the key of each row.
+        Rows whose key is already taken are given the next free key instead.
+        """
+        if not values: return []
+        return await self._run(_insertunique, f'INSERT INTO {table} VALUES ({", ".join("?" for _ in values[0])})', list(values))
+
+    async def close(self) -> None:
+        """
+        Close the connection and stop the connection thread.
+        """
+        await self._run(lambda connection: connection.close())
+        self._connection = None
+        self._executor.shutdown(wait=False)
+
+    async def _run(self, function: Callable[..., ResultType], *args: Any) -> ResultType:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(self._call, function, *args))
+
+    def _call(self, function: Callable[..., ResultType], *args: Any) -> ResultType:
+        # open the connection on the connection thread
+        if self._connection is None:
+            log.debug(f'Opening database connection to {self._path}')
+            self._connection = sqlite3.connect(self._path, timeout=10, cached_statements=self._cached_statements)
+            self._connection.row_factory = sqlite3.Row
+        return function(self._connection, *args)
+
+
+def _execute(connection: sqlite3.Connection, sql: str, parameters: Sequence[Any]) -> int:
+    with connection:
+        return connection.execute(sql, parameters).rowcount
+
+def _executemany(connection: sqlite3.Connection, sql: str, parameters: List[Sequence[Any]]) -> int:
+    with connection:
+        return connection.executemany(sql, parameters).rowcount
+
+def _insertunique(connection: sqlite3.Connection, sql: str, parameters: List[Sequence[Any]]) -> List[int]:
+    keys: List[int] = []
+    with connection:
+        for values in parameters:
+            try:
+                connection.execute(sql, values)
+                keys.append(values[0])
+            except sqlite3.IntegrityError:
+                # a null integer primary key takes the next free key
+                cursor: sqlite3.Cursor = connection.execute(sql, (None, *values[1:]))
+                keys.append(cursor.lastrowid) # type: ignore
+    return keys
+
+def _executescript(connection: sqlite3.Connection, script: str) -> None:
+    with connection:
+        connection.executescript(script)
+
+def _fetchone(connection: sqlite3.Connection, sql: str, parameters: Sequence[Any]) -> Optional[sqlite3.Row]:
+    return connection.execute(sql, parameters).fetchone()
+
+def _fetchall(connection: sqlite3.Connection, sql: str, parameters: Sequence[Any]) -> List[sqlite3.Row]:
+    return connection.execute(sql, parameters).fetchall()
+
+def _cursor(connection: sqlite3.Connection, sql: str, parameters: Sequence[Any]) -> sqlite3.Cursor:
+    return connection.execute(sql, parameters)
@@ -1,15 +1,75 @@
-from datetime import datetime
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 import hashlib
 from io import BytesIO
-from typing import List, Literal, Optional, Tuple, Union
+from typing import List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlparse
 import discord
 
 from .metadata import Metadata
+from .processes import ProcessUsage
+from .profiling import MemorySummary
+from .thumbnail import ThumbnailFormat, detect
+
+
+class ThumbnailCache():
+    """
+    Maps thumbnail digests to the CDN URL of their first upload as an attachment.
+    """
+
+    def __init__(self, *, capacity: int = 1024, margin: timedelta = timedelta(minutes=10)) -> None:
+        self._urls: OrderedDict[str, str] = OrderedDict()
+        """The CDN URLs keyed by thumbnail digest, in least recently used order."""
+        self._capacity: int = capacity
+        """The maximum number of URLs to retain."""
+        self._margin: timedelta = margin
+        """How long before a URL's expiry it stops being reused."""
+
+    def get(self, identifier: str) -> Optional[str]:
+        """
+        Get the CDN URL for a thumbnail digest, if it has been uploaded and has not expired.
+        """
+        url: Optional[str] = self._urls.get(identifier, None)
+        if url is None: return None
+
+        # discard the URL if its signature is about to expire
+        expiry: Optional[datetime] = _expiry(url)
+        if expiry and expiry - self._margin <= datetime.now(timezone.utc):
+            del self._urls[identifier]
+            return None
+
+        self._urls.move_to_end(identifier)
+        return url
+
+    def store(self, message: discord.Message) -> None:
+        """
+        Record the CDN URLs of thumbnail attachments on a sent message.
+        """
+        for attachment in message.attachments:
+            # thumbnail attachments are named by their digest
+            identifier: str = attachment.filename.split('.')[0]
+            self._urls[identifier] = attachment.url
+            self._urls.move_to_end(identifier)
+
+        # evict the least recently used URLs
+        while len(self._urls) > self._capacity: self._urls.popitem(last=False)
+
+
+def _expiry(url: str) -> Optional[datetime]:
+    # signed CDN URLs carry their expiry as a hexadecimal timestamp
+    values: List[str] = parse_qs(urlparse(url).query).get('ex', [])
+    try:
+        return datetime.fromtimestamp(int(values[0], 16), tz=timezone.utc) if values else None
+    except ValueError:
+        return None
+
+
+THUMBNAILS: ThumbnailCache = ThumbnailCache()
 
 
 class RequestEmbed(discord.Embed):
 
-    def __init__(self, metadata: Metadata, user: Union[discord.User, discord.Member], timestamp: Optional[datetime] = None, *, large_image: bool = True, thumbnail_format: Literal['png', 'bmp'] = 'png'):
+    def __init__(self, metadata: Metadata, user: Union[discord.User, discord.Member], timestamp: Optional[datetime] = None, *, large_image: bool = True, thumbnail_format: Optional[ThumbnailFormat] = None):
         # store the provided metadata
         self._metadata: Metadata = metadata
 
@@ -22,24 +82,32 @@ class RequestEmbed(discord.Embed):
         self.set_author(name=user.display_name, icon_url=user.avatar.url if user.avatar else None)
 
         thumbnail: Optional[bytes] = self._metadata.thumbnail
-        image_data: BytesIO = BytesIO(thumbnail) if thumbnail else BytesIO()
 
         identifier: Optional[str] = hashlib.md5(thumbnail).hexdigest() if thumbnail else None
-        filename: Optional[str] = '.'.join([identifier, thumbnail_format]) if identifier else None
-        self._file: Optional[discord.File] = discord.File(fp=image_data, filename=filename)
+        # name the attachment by the thumbnail's encoding unless a format is provided
+        filename: Optional[str] = '.'.join([identifier, thumbnail_format if thumbnail_format else detect(thumbnail)]) if identifier and thumbnail else None
+        # reference a previous upload of the thumbnail if one is available
+        cached_url: Optional[str] = THUMBNAILS.get(identifier) if identifier else None
+        self._file: Optional[discord.File] = discord.File(fp=BytesIO(thumbnail), filename=filename) if thumbnail and not cached_url else None
 
-        thumbnail_url: Optional[str] = f'attachment://{self._file.filename}' if self._file else None
+        thumbnail_url: Optional[str] = cached_url if cached_url else f'attachment://{self._file.filename}' if self._file else None
         self.set_image(url=thumbnail_url if large_image else None)
         self.set_thumbnail(url=thumbnail_url if not large_image else None)
 
     @property
     def file(self) -> Optional[discord.File]:
         return self._file
+
+    def cache(self, message: discord.Message) -> None:
+        """
+        Record the CDN URL of the thumbnail uploaded with the message for reuse.
+        """
+        if self._file: THUMBNAILS.store(message)
         
 
 class RequestQueueEmbed(discord.Embed):
 
-    def __init__(self, interaction: discord.Interaction, metadata: Metadata, queue: List[Metadata], large_image: bool = False, thumbnail_format: Literal['png', 'bmp'] = 'png'):
+    def __init__(self, interaction: discord.Interaction, metadata: Metadata, queue: List[Metadata], large_image: bool = False, thumbnail_format: Optional[ThumbnailFormat] = None):
         # store the provided metadata
         self._metadata: Metadata = metadata
 
@@ -54,13 +122,15 @@ class RequestQueueEmbed(discord.Embed):
         self.set_author(name=user.display_name, icon_url=user.avatar.url if user.avatar else None)
 
         thumbnail: Optional[bytes] = self._metadata.thumbnail
-        image_data: BytesIO = BytesIO(thumbnail) if thumbnail else BytesIO()
 
         identifier: Optional[str] = hashlib.md5(thumbnail).hexdigest() if thumbnail else None
-        filename: Optional[str] = '.'.join([identifier, thumbnail_format]) if identifier else None
-        self._file: Optional[discord.File] = discord.File(fp=image_data, filename=filename)
+        # name the attachment by the thumbnail's encoding unless a format is provided
+        filename: Optional[str] = '.'.join([identifier, thumbnail_format if thumbnail_format else detect(thumbnail)]) if identifier and thumbnail else None
+        # reference a previous upload of the thumbnail if one is available
+        cached_url: Optional[str] = THUMBNAILS.get(identifier) if identifier else None
+        self._file: Optional[discord.File] = discord.File(fp=BytesIO(thumbnail), filename=filename) if thumbnail and not cached_url else None
 
-        thumbnail_url: Optional[str] = f'attachment://{self._file.filename}' if self._file else None
+        thumbnail_url: Optional[str] = cached_url if cached_url else f'attachment://{self._file.filename}' if self._file else None
         self.set_image(url=thumbnail_url if large_image else None)
         self.set_thumbnail(url=thumbnail_url if not large_image else None)
 
@@ -69,6 +139,12 @@ class RequestQueueEmbed(discord.Embed):
     @property
     def file(self) -> Optional[discord.File]:
         return self._file
+
+    def cache(self, message: discord.Message) -> None:
+        """
+        Record the CDN URL of the thumbnail uploaded with the message for reuse.
+        """
+        if self._file: THUMBNAILS.store(message)
         
 
 class RequestFrequencyEmbed(discord.Embed):
@@ -98,3 +174,71 @@ class RequestRecentEmbed(discord.Embed):
         self.set_author(name=user.display_name, icon_url=user.avatar.url if user.avatar else None)
 
         for item, timestamp in metadata: self.add_field(name=item.title, value=f'{timestamp.strftime("%Y-%m-%d")}', inline=False)
+
+class RequestBulkEmbed(discord.Embed):
+
+    def __init__(self, interaction: discord.Interaction, metadata: List[Metadata], failures: List[Tuple[str, str]]):
+        color: discord.Color = discord.Color.blurple()
+        user: Union[discord.User, discord.Member] = interaction.user
+        title: str = 'Queued Requests'
+        description: Optional[str] = f'{len(metadata)} queued, {len(failures)} failed' if failures else f'{len(metadata)} queued'
+        url: Optional[str] = None
+        timestamp: Optional[datetime] = interaction.created_at
+        super().__init__(color=color, title=title, description=description, url=url, timestamp=timestamp)
+        self.set_author(name=user.display_name, icon_url=user.avatar.url if user.avatar else None)
+
+        # embeds are limited to 25 fields, so failures are listed first
+        for name, reason in failures[:25]: self.add_field(name=f'Failed: {name}'[:256], value=reason[:1024], inline=False)
+        for item in metadata[:25 - len(self.fields)]: self.add_field(name=(item.title if item.title else 'Unknown Title')[:256], value=item.artist if item.artist else 'Unknown Artist', inline=False)
+
+class RequestSearchEmbed(discord.Embed):
+
+    def __init__(self, interaction: discord.Interaction, query: str, metadata: List[Metadata], page: int):
+        color: discord.Color = discord.Color.blurple()
+        user: Union[discord.User, discord.Member] = interaction.user
+        title: str = 'Request History'
+        description: Optional[str] = f'Results for "{query}"'
+        url: Optional[str] = None
+        timestamp: Optional[datetime] = interaction.created_at
+        super().__init__(color=color, title=title, description=description, url=url, timestamp=timestamp)
+        self.set_author(name=user.display_name, icon_url=user.avatar.url if user.avatar else None)
+        self.set_footer(text=f'Page {page}')
+
+        for item in metadata: self.add_field(name=item.title, value=f'{item.artist} <{item.hyperlink}>' if item.artist else f'<{item.hyperlink}>', inline=False)
+
+class ProcessStatsEmbed(discord.Embed):
+
+    def __init__(self, interaction: discord.Interaction, usage: List[ProcessUsage]):
+        color: discord.Color = discord.Color.blurple()
+        user: Union[discord.User, discord.Member] = interaction.user
+        title: str = 'Playback Processes'
+        rss: int = sum(item.rss for item in usage if item.rss)
+        description: Optional[str] = f'{len(usage)} running, {rss / 2**20:.1f} MiB resident'
+        url: Optional[str] = None
+        timestamp: Optional[datetime] = interaction.created_at
+        super().__init__(color=color, title=title, description=description, url=url, timestamp=timestamp)
+        self.set_author(name=user.display_name, icon_url=user.avatar.url if user.avatar else None)
+
+        # embeds are limited to 25 fields
+        for item in usage[:25]:
+            cpu: str = f'{item.cpu:.1f}% CPU' if item.cpu is not None else 'CPU unknown'
+            memory: str = f'{item.rss / 2**20:.1f} MiB' if item.rss is not None else 'memory unknown'
+            self.add_field(name=f'{item.label} {item.pid}', value=f'{cpu}, {memory}, {item.age:.0f}s old\nguild {item.guild_id}, request {item.request_id}', inline=False)
+
+class MemoryProfileEmbed(discord.Embed):
+
+    def __init__(self, interaction: discord.Interaction, summaries: List[MemorySummary], *, enabled: bool):
+        color: discord.Color = discord.Color.blurple()
+        user: Union[discord.User, discord.Member] = interaction.user
+        title: str = 'Memory Profile'
+        description: Optional[str] = None if enabled else 'Memory profiling is disabled.'
+        url: Optional[str] = None
+        timestamp: Optional[datetime] = interaction.created_at
+        super().__init__(color=color, title=title, description=description, url=url, timestamp=timestamp)
+        self.set_author(name=user.display_name, icon_url=user.avatar.url if user.avatar else None)
+
+        for item in summaries[:25]:
+            peaks: str = f'peak {item.maximum / 2**20:.1f} MiB, mean {item.mean / 2**20:.1f} MiB over {item.count} requests'
+            sites: str = '\n'.join(f'`{site}`' for site in item.sites)
+            # field values are limited to 1024 characters
+            self.add_field(name=f'{item.kind}.{item.stage}', value=f'{peaks}\n{sites}'[:1024], inline=False)
@@ -0,0 +1,85 @@
+from typing import Literal, Optional
+
+from .metadata import Metadata
+from .request import FileRequest, Request, YouTubeRequest
+
+Kind = Literal['youtube', 'file', 'request']
+
+
+class QueueEntry():
+    """
+    A compact record of a queued request.
+
+    Entries waiting behind others hold only what is needed to rebuild their
+    request, which is re-hydrated just before playback. Requests that cannot be
+    rebuilt are held as is.
+    """
+
+    __slots__ = ('id', 'user_id', 'title', 'artist', 'hyperlink', 'kind', 'source', 'start', 'gain', 'request')
+
+    def __init__(self, kind: Kind, source: str, *, id: int, user_id: Optional[int] = None, title: Optional[str] = None, artist: Optional[str] = None, hyperlink: Optional[str] = None, start: float = 0, gain: Optional[float] = None, request: Optional[Request] = None) -> None:
+        """
+        Initialize an entry for a request of the provided kind and source.
+        """
+
+        self.id: int = id
+        """The id of the request."""
+
+        self.user_id: Optional[int] = user_id
+        """The id of the requesting user."""
+
+        self.title: Optional[str] = title
+        """The title of the requested track."""
+
+        self.artist: Optional[str] = artist
+        """The artist of the requested track."""
+
+        self.hyperlink: Optional[str] = hyperlink
+        """The hyperlink of the requested track."""
+
+        self.kind: Kind = kind
+        """The type of request."""
+
+        self.source: str = source
+        """The query or attachment URL the request is rebuilt from."""
+
+        self.start: float = start
+        """The position in seconds playback starts from."""
+
+        self.gain: Optional[float] = gain
+        """The gain in decibels applied during playback, if any."""
+
+        self.request: Optional[Request] = request
+        """The request, while it is held."""
+
+    @property
+    def metadata(self) -> Metadata:
+        """
+        Metadata for the entry, without a thumbnail.
+        """
+        return Metadata(self.id, user_id=self.user_id, title=self.title, artist=self.artist, hyperlink=self.hyperlink)
+
+    @classmethod
+    def of(cls, request: Request) -> 'QueueEntry':
+        """
+        Create an entry holding a request.
+        """
+
+        metadata: Metadata = request.metadata
+        kind: Kind = 'request'
+        source: str = ''
+        # resolved tracks are rebuilt from their hyperlink, so they are not searched for again
+        if isinstance(request, YouTubeRequest): kind, source = 'youtube', metadata.hyperlink if metadata.hyperlink else request.query
+        if isinstance(request, FileRequest): kind, source = 'file', request.url
+
+        gain: Optional[float] = request.gain if isinstance(request, (YouTubeRequest, FileRequest)) else None
+        return cls(kind, source, id=metadata.id, user_id=metadata.user_id, title=metadata.title, artist=metadata.artist, hyperlink=metadata.hyperlink, start=request.start, gain=gain, request=request)
+
+    def compact(self) -> None:
+        """
+        Release the held request if it can be rebuilt.
+        """
+        if self.kind == 'request': return
+        # a spooled attachment is removed along with its request, so keep the request rather than download it again
+        if isinstance(self.request, FileRequest) and self.request.spooled: return
+        self.request = None
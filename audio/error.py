@@ -29,4 +29,28 @@ class InvalidChannelException(AudioError):
     def __init__(self, channel: Optional[discord.abc.GuildChannel], exception: Optional[Exception] = None):
         reference: str = channel.mention if channel else 'unknown'
         message: str = f'Cannot connect to {reference} channel'
-        super().__init__(message, exception)
\ No newline at end of file
+        super().__init__(message, exception)
+
+class CachedFailureError(AudioError):
+    """
+    """
+
+    def __init__(self, query: str, reason: str, exception: Optional[Exception] = None):
+        message: str = f'{query} recently failed and will not be retried yet: {reason}'
+        super().__init__(message, exception)
+
+class BackoffError(AudioError):
+    """
+    """
+
+    def __init__(self, domain: str, delay: float, exception: Optional[Exception] = None):
+        message: str = f'Requests to {domain} are failing. Try again in {delay:.0f} seconds.'
+        super().__init__(message, exception)
+
+class OverloadedError(AudioError):
+    """
+    """
+
+    def __init__(self, exception: Optional[Exception] = None):
+        message: str = 'Too many requests are waiting to be played. Try again shortly.'
+        super().__init__(message, exception)
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+from logging import Logger
+from typing import Awaitable, Callable, Dict, Generic, Hashable, TypeVar
+
+log: Logger = logging.getLogger(__name__)
+
+ResultType = TypeVar('ResultType')
+
+
+class SingleFlight(Generic[ResultType]):
+    """
+    Coalesces concurrent calls for the same key into a single execution.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize the flight registry.
+        """
+
+        self._flights: Dict[Hashable, asyncio.Future[ResultType]] = dict()
+        """The in-flight executions, keyed by their identifying key."""
+
+        self._waiters: Dict[asyncio.Future[ResultType], int] = dict()
+        """The number of callers awaiting each in-flight execution."""
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[ResultType]]) -> ResultType:
+        """
+        Await the in-flight execution for the key, starting one from the factory if none exists.
+        """
+
+        flight: asyncio.Future[ResultType] | None = self._flights.get(key, None)
+
+        if flight is None:
+            flight = asyncio.ensure_future(factory())
+            self._flights[key] = flight
+            flight.add_done_callback(lambda done: self._land(key, done))
+        else:
+            log.debug(f'Joining in-flight execution for {key}')
+
+        # shield the shared execution so one caller's cancellation does not affect the others
+        self._waiters[flight] = self._waiters.get(flight, 0) + 1
+        try:
+            return await asyncio.shield(flight)
+        finally:
+            self._waiters[flight] -= 1
+            if self._waiters[flight] == 0:
+                del self._waiters[flight]
+                # cancel the shared execution once no caller is waiting for it, unregistering it first so later callers start afresh
+                if not flight.done():
+                    if self._flights.get(key, None) is flight: del self._flights[key]
+                    flight.cancel()
+
+    def _land(self, key: Hashable, flight: asyncio.Future[ResultType]) -> None:
+        # remove the execution if it is still the registered one for the key
+        if self._flights.get(key, None) is flight: del self._flights[key]
+        # mark the exception as retrieved if every caller was cancelled
+        if not flight.cancelled(): flight.exception()
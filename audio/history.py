@@ -0,0 +1,82 @@
+import logging
+import re
+from logging import Logger
+from typing import List
+
+from .database import AsyncDatabase
+from .metadata import Metadata
+
+log: Logger = logging.getLogger(__name__)
+
+
+class History():
+    """
+    Full-text search over request history, backed by an FTS5 index of the Metadata table.
+    """
+
+    def __init__(self, database: AsyncDatabase) -> None:
+        """
+        Initialize history search over the provided database.
+        """
+
+        self._database: AsyncDatabase = database
+        """The database containing the Metadata table."""
+
+    async def create(self) -> None:
+        """
+        Create the search index and the triggers that keep it in sync with the Metadata table.
+        """
+
+        exists: bool = await self._database.fetchone("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'MetadataSearch'") is not None
+
+        await self._database.executescript(SCHEMA)
+        # populate the index from existing history when it is first created
+        if not exists:
+            log.info('Building history search index')
+            await self._database.execute("INSERT INTO MetadataSearch(MetadataSearch) VALUES ('rebuild')")
+
+    async def search(self, query: str, *, page: int = 1, size: int = 10) -> List[Metadata]:
+        """
+        Find distinct tracks matching the query, best match first.
+        """
+
+        expression: str = _to_expression(query)
+        if not expression: return []
+
+        offset: int = max(page - 1, 0) * size
+        # thumbnails are not read, so results stay small regardless of history size
+        return [Metadata.__from_row__(row) async for row in self._database.stream(SEARCH, (expression, size, offset), size=size)]
+
+
+def _to_expression(query: str) -> str:
+    # match every token in the query as a quoted prefix
+    return ' '.join(f'"{token}"*' for token in re.findall(r'\w+', query))
+
+
+SCHEMA: str = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS MetadataSearch USING fts5(Title, Artist, Hyperlink, content='Metadata', content_rowid='ID');
+
+CREATE TRIGGER IF NOT EXISTS MetadataSearchInsert AFTER INSERT ON Metadata BEGIN
+    INSERT INTO MetadataSearch(rowid, Title, Artist, Hyperlink) VALUES (new.ID, new.Title, new.Artist, new.Hyperlink);
+END;
+
+CREATE TRIGGER IF NOT EXISTS MetadataSearchDelete AFTER DELETE ON Metadata BEGIN
+    INSERT INTO MetadataSearch(MetadataSearch, rowid, Title, Artist, Hyperlink) VALUES ('delete', old.ID, old.Title, old.Artist, old.Hyperlink);
+END;
+
+CREATE TRIGGER IF NOT EXISTS MetadataSearchUpdate AFTER UPDATE OF Title, Artist, Hyperlink ON Metadata BEGIN
+    INSERT INTO MetadataSearch(MetadataSearch, rowid, Title, Artist, Hyperlink) VALUES ('delete', old.ID, old.Title, old.Artist, old.Hyperlink);
+    INSERT INTO MetadataSearch(rowid, Title, Artist, Hyperlink) VALUES (new.ID, new.Title, new.Artist, new.Hyperlink);
+END;
+'''
+"""The search index and its synchronization triggers."""
+
+SEARCH: str = '''
+SELECT Metadata.ID, Metadata.UserID, Metadata.Title, Metadata.Artist, Metadata.Hyperlink, NULL AS Thumbnail
+FROM MetadataSearch JOIN Metadata ON Metadata.ID = MetadataSearch.rowid
+WHERE MetadataSearch MATCH ?
+GROUP BY Metadata.Hyperlink
+ORDER BY MIN(MetadataSearch.rank)
+LIMIT ? OFFSET ?
+'''
+"""Ranked, paginated search for distinct tracks."""
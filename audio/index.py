@@ -0,0 +1,95 @@
+import re
+from bisect import bisect_left, insort
+from typing import Dict, Iterator, List, Optional, Set
+
+from .metadata import Metadata
+
+
+class IndexEntry():
+    """
+    A distinct track in the history index.
+    """
+
+    __slots__ = ('hyperlink', 'title', 'artist', 'count')
+
+    def __init__(self, hyperlink: str, title: Optional[str], artist: Optional[str]) -> None:
+        self.hyperlink: str = hyperlink
+        self.title: Optional[str] = title
+        self.artist: Optional[str] = artist
+        self.count: int = 0
+        """The number of times the track has been requested."""
+
+    def __str__(self) -> str:
+        title: str = self.title if self.title else 'Unknown Title'
+        return f'{self.artist} - {title}' if self.artist else title
+
+
+class HistoryIndex():
+    """
+    An in-memory token prefix index over request history.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty index.
+        """
+
+        self._tokens: List[str] = []
+        """The distinct tokens in the index, sorted for prefix lookup."""
+
+        self._postings: Dict[str, Set[str]] = dict()
+        """The hyperlinks of the tracks containing each token."""
+
+        self._entries: Dict[str, IndexEntry] = dict()
+        """The tracks in the index, keyed by hyperlink."""
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, metadata: Metadata) -> None:
+        """
+        Add a request to the index.
+        """
+
+        # requests without a hyperlink cannot be resolved again, so ignore them
+        if not metadata.hyperlink: return
+
+        entry: Optional[IndexEntry] = self._entries.get(metadata.hyperlink, None)
+        if entry is None:
+            entry = IndexEntry(metadata.hyperlink, metadata.title, metadata.artist)
+            self._entries[metadata.hyperlink] = entry
+            for token in _tokenize(metadata.title, metadata.artist, metadata.hyperlink):
+                postings: Optional[Set[str]] = self._postings.get(token, None)
+                if postings is None:
+                    postings = set()
+                    self._postings[token] = postings
+                    insort(self._tokens, token)
+                postings.add(metadata.hyperlink)
+
+        entry.count += 1
+
+    def search(self, query: str, *, limit: int = 25) -> List[IndexEntry]:
+        """
+        Find the most requested tracks matching every token prefix in the query.
+        """
+
+        matches: Optional[Set[str]] = None
+        for token in _tokenize(query):
+            candidates: Set[str] = set().union(*self._expand(token))
+            matches = candidates if matches is None else matches & candidates
+            if not matches: return []
+
+        entries: List[IndexEntry] = [self._entries[hyperlink] for hyperlink in matches] if matches is not None else list(self._entries.values())
+        entries.sort(key=lambda entry: entry.count, reverse=True)
+        return entries[:limit]
+
+    def _expand(self, prefix: str) -> Iterator[Set[str]]:
+        # iterate the postings of every token beginning with the prefix
+        index: int = bisect_left(self._tokens, prefix)
+        while index < len(self._tokens) and self._tokens[index].startswith(prefix):
+            yield self._postings[self._tokens[index]]
+            index += 1
+
+
+def _tokenize(*values: Optional[str]) -> Set[str]:
+    return { token for value in values if value for token in re.findall(r'\w+', value.casefold()) }
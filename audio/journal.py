@@ -0,0 +1,125 @@
+import logging
+from logging import Logger
+from typing import Dict, List, Optional
+
+from .database import AsyncDatabase
+from .entry import QueueEntry
+
+log: Logger = logging.getLogger(__name__)
+
+
+class QueueJournal():
+    """
+    Persists queued requests incrementally so queues can be restored after a restart.
+
+    Each queued request is written as a row when queued and removed once played.
+    The playing request's position is checkpointed periodically.
+    """
+
+    def __init__(self, database: AsyncDatabase) -> None:
+        """
+        Initialize a journal stored in the provided database.
+        """
+
+        self._database: AsyncDatabase = database
+        """The database containing the journal table."""
+
+        self._sequences: Dict[QueueEntry, int] = dict()
+        """The journal row of each queued entry."""
+
+        self._sequence: int = 0
+        """The most recently assigned journal row."""
+
+    async def create(self) -> None:
+        """
+        Create the journal table.
+        """
+
+        await self._database.executescript(SCHEMA)
+        # journals created before gains were recorded lack the column
+        columns: List[str] = [row['name'] for row in await self._database.fetchall('PRAGMA table_info(QueueJournal)')]
+        if 'Gain' not in columns: await self._database.execute('ALTER TABLE QueueJournal ADD COLUMN Gain REAL')
+        self._sequence = (await self._database.fetchone('SELECT COALESCE(MAX(Sequence), 0) FROM QueueJournal'))[0] # type: ignore
+
+    async def guilds(self) -> List[int]:
+        """
+        Get the guilds that have journaled requests.
+        """
+        return [row['GuildID'] for row in await self._database.fetchall('SELECT DISTINCT GuildID FROM QueueJournal')]
+
+    async def add(self, guild_id: int, entry: QueueEntry) -> None:
+        """
+        Record a queued entry. Entries that cannot be rebuilt are ignored.
+        """
+
+        if entry.kind == 'request': return
+
+        self._sequence += 1
+        self._sequences[entry] = self._sequence
+
+        await self._database.execute(INSERT, (self._sequence, guild_id, entry.kind, entry.source, entry.id, entry.user_id, entry.title, entry.artist, entry.hyperlink, entry.start, entry.gain))
+
+    async def checkpoint(self, entry: QueueEntry, elapsed: float) -> None:
+        """
+        Record the playback position of an entry.
+        """
+
+        sequence: Optional[int] = self._sequences.get(entry, None)
+        if sequence is None: return
+        await self._database.execute('UPDATE QueueJournal SET Elapsed = ? WHERE Sequence = ?', (elapsed, sequence))
+
+    async def remove(self, entry: QueueEntry) -> None:
+        """
+        Remove a played entry.
+        """
+
+        sequence: Optional[int] = self._sequences.pop(entry, None)
+        if sequence is None: return
+        await self._database.execute('DELETE FROM QueueJournal WHERE Sequence = ?', (sequence,))
+
+    async def clear(self, guild_id: int) -> None:
+        """
+        Remove every request journaled for a guild.
+        """
+
+        self._sequences.clear()
+        await self._database.execute('DELETE FROM QueueJournal WHERE GuildID = ?', (guild_id,))
+
+    async def take(self, guild_id: int) -> List[QueueEntry]:
+        """
+        Remove and return the entries journaled for a guild, in queue order, starting from their last recorded position.
+        """
+
+        entries: List[QueueEntry] = [
+            QueueEntry(row['Kind'], row['Source'], id=row['ID'], user_id=row['UserID'], title=row['Title'], artist=row['Artist'], hyperlink=row['Hyperlink'], start=row['Elapsed'], gain=row['Gain'])
+            async for row in self._database.stream(SELECT_GUILD, (guild_id,))
+        ]
+        await self._database.execute('DELETE FROM QueueJournal WHERE GuildID = ?', (guild_id,))
+        log.info(f'Restoring {len(entries)} requests for guild {guild_id}')
+        return entries
+
+
+SCHEMA: str = '''
+CREATE TABLE IF NOT EXISTS QueueJournal (
+    Sequence INTEGER PRIMARY KEY,
+    GuildID INTEGER NOT NULL,
+    Kind TEXT NOT NULL,
+    Source TEXT NOT NULL,
+    ID INTEGER NOT NULL,
+    UserID INTEGER,
+    Title TEXT,
+    Artist TEXT,
+    Hyperlink TEXT,
+    Elapsed REAL NOT NULL DEFAULT 0,
+    Gain REAL
+);
+
+CREATE INDEX IF NOT EXISTS QueueJournalGuild ON QueueJournal (GuildID, Sequence);
+'''
+"""The journal table and its guild index."""
+
+INSERT: str = 'INSERT INTO QueueJournal (Sequence, GuildID, Kind, Source, ID, UserID, Title, Artist, Hyperlink, Elapsed, Gain) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+"""Records a queued request."""
+
+SELECT_GUILD: str = 'SELECT * FROM QueueJournal WHERE GuildID = ? ORDER BY Sequence'
+"""Selects the requests journaled for a guild, in queue order."""
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+from logging import Logger
+from sqlite3 import Row
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple, Type
+
+from bot.database import ColumnBuilder, Table, TableBuilder, TStorable
+
+from .processes import REGISTRY
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+
+log: Logger = logging.getLogger(__name__)
+
+
+SAMPLING_RATE: int = 48000
+"""The sampling rate audio is decoded at for analysis."""
+
+CHANNELS: int = 2
+"""The number of channels audio is decoded to for analysis."""
+
+SUBBLOCK: int = SAMPLING_RATE // 10
+"""The number of frames in a 100ms sub-block. Four sub-blocks form a 400ms gating block with 75% overlap."""
+
+K_WEIGHTING: List[List[float]] = [
+    [1.53512485958697, -2.69169618940638, 1.19839281085285, 1.0, -1.69065929318241, 0.73248077421585],
+    [1.0, -2.0, 1.0, 1.0, -1.99004745483398, 0.99007225036621],
+]
+"""The ITU-R BS.1770 K-weighting filter at 48kHz, as second-order sections."""
+
+REPLAYGAIN_REFERENCE: float = -18.0
+"""The loudness in LUFS that ReplayGain track gains are relative to."""
+
+
+class Loudness():
+    def __init__(self, hyperlink: str, *, integrated: float, peak: float) -> None:
+        self.hyperlink:     str = hyperlink
+        self.integrated:    float = integrated
+        """The integrated loudness in LUFS."""
+        self.peak:          float = peak
+        """The sample peak in dBFS."""
+
+    def __str__(self) -> str:
+        return f'{self.integrated:.2f} LUFS, {self.peak:.2f} dBFS <{self.hyperlink}>'
+
+    def gain(self, target: float, *, headroom: float = 1.0) -> float:
+        """
+        Calculate the gain in decibels that brings the track to the target loudness without clipping.
+        """
+        return min(target - self.integrated, -self.peak - headroom)
+
+    @classmethod
+    def from_replaygain(cls, hyperlink: str, gain: float, peak: float) -> Loudness:
+        """
+        Create a loudness measurement from ReplayGain track gain (dB) and peak (linear) values.
+        """
+        integrated: float = REPLAYGAIN_REFERENCE - gain
+        peak_db: float = 20 * math.log10(peak) if peak > 0 else -math.inf
+        return Loudness(hyperlink, integrated=integrated, peak=peak_db)
+
+    _table: Table
+
+    @classmethod
+    def __table__(cls) -> Table:
+        table: TableBuilder = TableBuilder().setName('Loudness')
+        column: ColumnBuilder = ColumnBuilder()
+        table.addColumn(column.setName('Hyperlink').setType('TEXT').isPrimary().isUnique().build())
+        table.addColumn(column.setName('Integrated').setType('REAL').build())
+        table.addColumn(column.setName('Peak').setType('REAL').build())
+        return table.build()
+
+    def __values__(self) -> Tuple[Any, ...]:
+        # create a tuple with the corresponding values
+        value: Tuple[Any, ...] = (self.hyperlink, self.integrated, self.peak)
+        # return the tuple
+        return value
+
+    @classmethod
+    def __from_row__(cls: Type[TStorable], row: Row) -> Loudness:
+        hyperlink: Optional[str] = row['Hyperlink'] if isinstance(row['Hyperlink'], str) else None
+        if not hyperlink: raise KeyError('hyperlink')
+
+        integrated: Optional[float] = row['Integrated'] if isinstance(row['Integrated'], float) else None
+        if integrated is None: raise KeyError('integrated')
+
+        peak: Optional[float] = row['Peak'] if isinstance(row['Peak'], float) else None
+        if peak is None: raise KeyError('peak')
+
+        return Loudness(hyperlink, integrated=integrated, peak=peak)
+
+
+async def analyze(hyperlink: str, source: str) -> Loudness:
+    """
+    Measure the integrated loudness and sample peak of a media source.
+
+    The source is decoded by FFmpeg to 48kHz stereo PCM and measured in 100ms
+    sub-blocks as it streams, so memory use does not grow with track length.
+    """
+
+    # analysis dependencies are heavy, so load them on first use
+    import numpy as np
+    from scipy.signal import sosfilt
+
+    arguments: List[str] = ['-nostdin', '-loglevel', 'error']
+    # allow network sources to recover from dropped connections
+    if source.startswith('http'): arguments += ['-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5']
+    arguments += ['-i', source, '-vn', '-f', 's16le', '-ac', str(CHANNELS), '-ar', str(SAMPLING_RATE), 'pipe:1']
+
+    process: asyncio.subprocess.Process = await asyncio.create_subprocess_exec('ffmpeg', *arguments, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+    REGISTRY.track(process, label='loudness')
+    if process.stdout is None: raise RuntimeError('Could not read decoder output')
+
+    # the filter state for each second-order section and channel
+    sos: NDArray = np.asarray(K_WEIGHTING)
+    state: NDArray = np.zeros((sos.shape[0], CHANNELS, 2))
+    # the mean square power of each sub-block
+    powers: List[float] = []
+    # the maximum absolute sample value
+    peak: int = 0
+
+    try:
+        chunk: int = SUBBLOCK * CHANNELS * 2
+        while True:
+            try:
+                data: bytes = await process.stdout.readexactly(chunk)
+            except asyncio.IncompleteReadError:
+                break
+
+            samples: NDArray = np.frombuffer(data, dtype=np.int16).reshape(-1, CHANNELS)
+            peak = max(peak, int(np.abs(samples.astype(np.int32)).max()))
+            # apply the K-weighting filter, carrying state across sub-blocks
+            weighted, state = sosfilt(sos, samples / 32768.0, axis=0, zi=state)
+            # sum the mean square power of each channel
+            powers.append(float(np.mean(np.square(weighted), axis=0).sum()))
+    finally:
+        if process.returncode is None: process.kill()
+        await process.wait()
+
+    if len(powers) < 4: raise ValueError(f'Not enough audio to measure loudness for {hyperlink}')
+
+    # combine sub-blocks into overlapping 400ms gating blocks
+    blocks: NDArray = np.convolve(np.asarray(powers), np.full(4, 0.25), mode='valid')
+    # apply the absolute gate
+    blocks = blocks[blocks > 10 ** ((-70 + 0.691) / 10)]
+    if blocks.size == 0: raise ValueError(f'Audio is silent for {hyperlink}')
+    # apply the relative gate
+    relative: float = -0.691 + 10 * math.log10(float(blocks.mean())) - 10
+    blocks = blocks[blocks > 10 ** ((relative + 0.691) / 10)]
+
+    integrated: float = -0.691 + 10 * math.log10(float(blocks.mean()))
+    peak_db: float = 20 * math.log10(peak / 32768.0) if peak > 0 else -math.inf
+    return Loudness(hyperlink, integrated=integrated, peak=peak_db)
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 import importlib.util
-from io import BytesIO
 from sqlite3 import Row
-from typing import Any, Optional, Tuple, Type
+from typing import TYPE_CHECKING, Any, Optional, Tuple, Type
 from bot.database import ColumnBuilder, Table, TableBuilder, TStorable
 
-import requests
+from .thumbnail import encode
+
+if TYPE_CHECKING:
+    from .loudness import Loudness
 
 
 class Metadata():
@@ -17,25 +19,11 @@ class Metadata():
         self.artist:    Optional[str] = artist
         self.hyperlink: Optional[str] = hyperlink
         self.thumbnail: Optional[bytes] = None
+        self.media_url: Optional[str] = media_url
+        self.loudness:  Optional[Loudness] = None
 
-        if importlib.util.find_spec('PIL') and thumbnail is not None:                
-            from PIL import Image                
-            # create a request to the thumbnail reference
-            response: Optional[requests.Response] = requests.get(thumbnail, stream=True)
-            # initialize a BytesIO instance from the data received from the request
-            thumbnail_data: Optional[BytesIO] = BytesIO(response.content) if response else None
-            # open the thumbnail data as an Image
-            image: Optional[Image.Image] = Image.open(thumbnail_data) if thumbnail_data else None
-            # initialize a buffer to save the thumbnail image data to
-            buffer: BytesIO = BytesIO()
-            # resize the image
-            if image: image.thumbnail((256, 256))
-            # save the image to the buffer
-            if image: image.save(fp=buffer, format='png')
-            # seek to the beginning of the buffer
-            buffer.seek(0)
-            # assign the metadata's thumbnail by reading the buffer out
-            self.thumbnail: Optional[bytes] = buffer.read() if image else None
+        # download the thumbnail, if a reference was provided
+        if thumbnail is not None: self.thumbnail = fetch_thumbnail(thumbnail)
 
     def __str__(self) -> str:
         return f'{self.artist} - {self.title} <{self.hyperlink}>'
@@ -81,4 +69,28 @@ class Metadata():
         thumbnail: Optional[bytes] = row['Thumbnail'] if isinstance(row['Thumbnail'], bytes) else None
         metadata.thumbnail = thumbnail
 
-        return metadata
\ No newline at end of file
+        return metadata
+
+
+def fetch_thumbnail(url: str) -> Optional[bytes]:
+    """
+    Download a thumbnail and re-encode it for embedding.
+    """
+
+    if not importlib.util.find_spec('PIL'): return None
+
+    import requests
+    # create a request to the thumbnail reference
+    response: Optional['requests.Response'] = requests.get(url, stream=True)
+    # resize and compress the thumbnail within the byte budget
+    return encode(response.content) if response else None
+
+
+METADATA_INDEX: str = 'CREATE INDEX IF NOT EXISTS MetadataUser ON Metadata (UserID, ID)'
+"""Indexes history by user, in request order."""
+
+SELECT_SUMMARIES: str = 'SELECT ID, UserID, Title, Artist, Hyperlink, NULL AS Thumbnail FROM Metadata WHERE ID <= ?'
+"""Selects every request up to the provided id without its thumbnail."""
+
+SELECT_RECENT: str = 'SELECT ID, UserID, Title, Artist, Hyperlink, NULL AS Thumbnail FROM Metadata WHERE UserID = ? ORDER BY ID DESC LIMIT ?'
+"""Selects a user's most recent requests without their thumbnails."""
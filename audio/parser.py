@@ -1,8 +1,7 @@
 import logging
-from pathlib import Path
 import sys
 from collections.abc import Buffer
-from io import BufferedIOBase, BytesIO
+from io import BufferedIOBase
 from logging import Logger
 from typing import (Any, Dict, Iterable, Iterator, List, Optional, Tuple,
                     TypedDict)
@@ -15,6 +14,8 @@ from mutagen.id3 import ID3, ID3FileType
 from mutagen.id3._frames import APIC
 from mutagen.mp4 import MP4, MP4Cover, MP4Tags
 
+from .thumbnail import default_thumbnail, encode
+
 log: Logger = logging.getLogger(__name__)
 logging.basicConfig(stream=sys.stdout, level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
@@ -23,6 +24,8 @@ class TagKeys(TypedDict):
     album: str
     artist: str
     title: str
+    gain: str
+    peak: str
 
 
 keys: Dict[type, TagKeys] = {
@@ -30,16 +33,22 @@ keys: Dict[type, TagKeys] = {
         'album':    'TALB',
         'artist':   'TPE1',
         'title':    'TIT2',
+        'gain':     'TXXX:REPLAYGAIN_TRACK_GAIN',
+        'peak':     'TXXX:REPLAYGAIN_TRACK_PEAK',
     },
     MP4Tags: {
         'album':    '©alb',
         'artist':   '©ART',
         'title':    '©nam',
+        'gain':     '----:com.apple.iTunes:replaygain_track_gain',
+        'peak':     '----:com.apple.iTunes:replaygain_track_peak',
     },
     VCFLACDict: {
         'album':    'ALBUM',
         'artist':   'ARTIST',
         'title':    'TITLE',
+        'gain':     'REPLAYGAIN_TRACK_GAIN',
+        'peak':     'REPLAYGAIN_TRACK_PEAK',
     }
 }
 
@@ -107,6 +116,37 @@ class Parser():
         values: List[str] = [value for value in content if isinstance(value, str)]
         return values
     
+    @property
+    def replaygain(self) -> Optional[Tuple[float, float]]:
+        """Retrieve the ReplayGain track gain (dB) and peak (linear) for the file-like object."""
+
+        values: List[float] = []
+        for name in ['gain', 'peak']:
+            key: Optional[str] = self._keys.get(name, None) if self._keys else None                     # type: ignore
+            data: Optional[Any] = self._lookup(key) if key else None
+            content: Optional[Iterator[Any]] = iter(data) if isinstance(data, Iterable) else None           # type: ignore
+            if not isinstance(content, Iterator): return None
+
+            # freeform MP4 values are stored as bytes
+            texts: List[str] = [value.decode('utf-8', 'ignore') if isinstance(value, bytes) else value for value in content]
+            numbers: List[float] = [number for number in map(_to_number, texts) if number is not None]
+            if not numbers: return None
+            values.append(numbers[0])
+
+        gain, peak = values
+        return (gain, peak)
+    
+    def _lookup(self, key: str) -> Optional[Any]:
+        """Retrieve a tag, matching its key case-insensitively if no exact match exists."""
+
+        data: Optional[Any] = self._tags.get(key, None)                                                     # type: ignore
+        if data is not None: return data
+        # taggers disagree on the case of user-defined keys such as TXXX:replaygain_track_gain
+        folded: str = key.casefold()
+        for name in self._tags.keys():                                                                      # type: ignore
+            if isinstance(name, str) and name.casefold() == folded: return self._tags.get(name, None)       # type: ignore
+        return None
+
     @property
     def cover(self) -> Optional[Buffer]:
         """Retrieve the album cover binary image data."""
@@ -126,7 +166,7 @@ class Parser():
 
     def _extract_flac(self, *, size: Tuple[int, int]) -> Optional[Buffer]:
         if not isinstance(self._file, FLAC): return None
-        pictures: List[Any] = file.pictures # type: ignore
+        pictures: List[Any] = self._file.pictures # type: ignore
         buffers: List[Buffer] = [picture.data for picture in pictures if isinstance(picture.data, Buffer)]      # type: ignore
         try:
             buffer: Optional[Buffer] = buffers.pop(0)
@@ -162,58 +202,17 @@ class Parser():
         return _to_thumbnail(buffer, size=size) if buffer else _default_thumbnail(size=size)
 
 
-try:
-    from PIL import Image
-    
-    def _to_thumbnail(buffer: Buffer, *, size: Tuple[int, int]) -> Optional[Buffer]:
-        # load the provided buffer into a stream
-        input: BytesIO = BytesIO(buffer)
-
-        # open the stream as an image
-        image: Image.Image = Image.open(fp=input, mode='r')
-        # create a thumbnail from the image of size
-        image.thumbnail(size)
-
-        # create a stream so write data to
-        output: BufferedIOBase = BytesIO()
-        # save the image to the stream
-        image.save(fp=output, format='png')
-        # seek to the beginning of the stream
-        output.seek(0)
-        # read out a buffer from the stream
-        return output.read()
-    
-    def _default_thumbnail(*, size: Tuple[int, int]) -> Optional[Buffer]:
-        # get the path of the default png
-        path: Path = Path(__file__).parent.joinpath('default.png')
-        # if the file does not exist, return None
-        if not path.exists():
-            log.warning(f'Cannot find {path.name} in directory {path.parent}')
-            return None
-
-        # open the file and read the contents
-        with open(path, 'rb') as file: buffer: Buffer = file.read()
-        # load read buffer into stream
-        input: BytesIO = BytesIO(buffer)
-
-        # open the stream as an image
-        image: Image.Image = Image.open(fp=input, mode='r')
-        # create a thumbnail from the image of size
-        image.thumbnail(size)
-
-        # create a stream so write data to
-        output: BufferedIOBase = BytesIO()
-        # save the image to the stream
-        image.save(fp=output, format='png')
-        # seek to the beginning of the stream
-        output.seek(0)
-        # read out a buffer from the stream
-        return output.read()
-    
-except ModuleNotFoundError:
-
-    def _to_thumbnail(buffer: Buffer, size: Tuple[int, int]) -> Optional[Buffer]:
+def _to_number(text: Any) -> Optional[float]:
+    if not isinstance(text, str): return None
+    try:
+        # strip the unit suffix from values such as '-6.50 dB'
+        return float(text.strip().split(' ')[0])
+    except ValueError:
         return None
-    
-    def _default_thumbnail(*, size: Tuple[int, int]) -> Optional[Buffer]:
-        return None
\ No newline at end of file
+
+
+def _to_thumbnail(buffer: Buffer, *, size: Tuple[int, int]) -> Optional[Buffer]:
+    return encode(bytes(buffer), size=size)
+
+def _default_thumbnail(*, size: Tuple[int, int]) -> Optional[Buffer]:
+    return default_thumbnail(size=size)
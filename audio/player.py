@@ -7,19 +7,26 @@ from asyncio import Event
 from logging import Logger
 from os import PathLike
 from pathlib import Path
-from typing import NoReturn, Optional
+import time
+from typing import Awaitable, Callable, NoReturn, Optional, Tuple, Union
 import subprocess
 
 from discord import AudioSource, ClientException, FFmpegOpusAudio, Interaction, Member, StageChannel, VoiceChannel, VoiceClient, VoiceState
 import discord
 
-from .error import InvalidChannelException
-
-from .request import Request
+from .entry import QueueEntry
+from .error import AudioError, InvalidChannelException
+from .journal import QueueJournal
+from .processes import REGISTRY
+from .profiling import PROFILER
+from .request import Request, YouTubeRequest
 from .queue import Queue
 
 log: Logger = logging.getLogger(__name__)
 
+CHECKPOINT_INTERVAL: float = 15
+"""The interval in seconds between playback position checkpoints."""
+
 
 class Player():
 
@@ -27,17 +34,57 @@ class Player():
     def current(self) -> Optional[Request]:
         """The currently playing request, if any."""
 
-        return self._queue.current
+        entry: Optional[QueueEntry] = self._queue.current
+        return entry.request if entry else None
+
+    @property
+    def processing(self) -> Optional[QueueEntry]:
+        """The entry being processed into an audio source, if any."""
+        return self._queue.current if self._processing and not self._processing.done() else None
     
     @property
     def is_connected(self) -> bool:
         return self._client.is_connected() if self._client else False
+
+    @property
+    def bitrate(self) -> Optional[int]:
+        """The bitrate of the connected voice channel in kbps, if known."""
+        channel: Optional[discord.abc.Connectable] = self._client.channel if self._client else None
+        bitrate: Optional[int] = getattr(channel, 'bitrate', None)
+        return bitrate // 1000 if bitrate else None
     
+    @property
+    def autoplay(self) -> Optional[Callable[[Request], Awaitable[Optional[Request]]]]:
+        """Provides the next request when the queue runs out, if set."""
+        return self._autoplay
+
+    @autoplay.setter
+    def autoplay(self, value: Optional[Callable[[Request], Awaitable[Optional[Request]]]]) -> None:
+        self._autoplay = value
+
+    @property
+    def hydrator(self) -> Optional[Callable[[QueueEntry], Request]]:
+        """Rebuilds the request of a compacted queue entry, if set."""
+        return self._hydrator
+
+    @hydrator.setter
+    def hydrator(self, value: Optional[Callable[[QueueEntry], Request]]) -> None:
+        self._hydrator = value
+
+    @property
+    def journal(self) -> Optional[QueueJournal]:
+        """Persists queued requests across restarts, if set."""
+        return self._journal
+
+    @journal.setter
+    def journal(self, value: Optional[QueueJournal]) -> None:
+        self._journal = value
+
     @property
     def tone(self) -> Optional[AudioSource]:
         return self._load_tone(self._tone_path) if self._tone_path else None
 
-    def __init__(self, *, timeout: Optional[float] = None, tone: Optional[PathLike[str]] = None) -> None:
+    def __init__(self, *, timeout: Optional[float] = None, tone: Optional[PathLike[str]] = None, prefetch: bool = False) -> None:
         """
         """
 
@@ -47,8 +94,8 @@ class Player():
         self._client: Optional[VoiceClient] = None
         """The client for accessing a voice connection."""
 
-        self._queue: Queue[Request] = Queue()
-        """The queue for storing requests."""
+        self._queue: Queue[QueueEntry] = Queue()
+        """The queue for storing request entries."""
 
         self._timeout: Optional[float] = timeout
         """The timeout in seconds before automatically disconnecting."""
@@ -59,6 +106,30 @@ class Player():
         self._tone_path: Optional[PathLike[str]] = tone
         """A connection tone file path, if provided."""
 
+        self._greeting: Optional[asyncio.Task[None]] = None
+        """The task playing the connection tone, if any."""
+
+        self._autoplay: Optional[Callable[[Request], Awaitable[Optional[Request]]]] = None
+        """Provides the next request when the queue runs out, if set."""
+
+        self._stopped: bool = False
+        """Whether playback was stopped since the last request was queued."""
+
+        self._prefetch: bool = prefetch
+        """Whether the next request is extracted during playback."""
+
+        self._prepared: Optional[Tuple[QueueEntry, asyncio.Task[Request]]] = None
+        """The upcoming entry and the task extracting its request, if any."""
+
+        self._hydrator: Optional[Callable[[QueueEntry], Request]] = None
+        """Rebuilds the request of a compacted queue entry, if set."""
+
+        self._processing: Optional[asyncio.Task[AudioSource]] = None
+        """The task processing the current request into an audio source, if any."""
+
+        self._journal: Optional[QueueJournal] = None
+        """Persists queued requests across restarts, if provided."""
+
     async def loop(self) -> NoReturn:
         """
         The audio playback loop.
@@ -81,10 +152,10 @@ class Player():
 
                 log.debug('Waiting for next playback request')
                 # wait for the queue to produce a request, or throw TimeoutError
-                request: Request = await asyncio.wait_for(self._queue.get(), self._timeout)
+                entry: QueueEntry = await asyncio.wait_for(self._queue.get(), self._timeout)
 
                 # play the request
-                await self._play(request)
+                await self._play(entry)
 
             # catch timeout exception
             except (TimeoutError) as exception:
@@ -96,27 +167,55 @@ class Player():
                 # handle the exception
                 await self._on_exception(exception)
 
-    async def _play(self, request: Request) -> None:
+    async def _play(self, entry: QueueEntry) -> None:
         """
         Play a request and await completion.
         """
 
+        # wait for the connection tone to finish
+        if self._greeting: await asyncio.wait([self._greeting])
+        self._greeting = None
+
         # signal the player is no longer inactive
         self._inactive.clear()
         # if the voice client is unavailable, return
         if self._client is None: return
 
+        # the monotonic time playback started at
+        started: float = time.monotonic()
+        # the audio source, once processed
+        source: Optional[AudioSource] = None
         try:
-            log.debug(f'Playing request {request.metadata.id}: {request.metadata.title}')
-            # get the audio source from the request
-            source: AudioSource = await request.process()
+            log.debug(f'Playing request {entry.id}: {entry.title}')
+            # get the audio source from the request, rebuilding the request if it was compacted,
+            # in a task that skipping, stopping or disconnecting can cancel
+            self._processing = asyncio.create_task(self._source(entry))
+            source = await self._processing
             # play the request
             self._client.play(source, after=self._on_finish)
+            # prepare the upcoming request while this one plays
+            self._prepare()
+            started = time.monotonic()
+        # if processing was cancelled
+        except asyncio.CancelledError:
+            # if the player itself is being cancelled, propagate the cancellation
+            current: Optional[asyncio.Task[object]] = asyncio.current_task()
+            if current and current.cancelling(): raise
+            log.debug(f'Cancelled request {entry.id}: {entry.title}')
+            REGISTRY.release(source)
+            self._inactive.set()
         # if an error occurred during subprocess execution
         except subprocess.CalledProcessError as exception:
+            REGISTRY.release(source)
             await self._on_exception(exception)
+            self._inactive.set()
         except Exception as exception:
+            # release the source's process if playback could not start
+            REGISTRY.release(source)
             await self._on_exception(exception)
+            self._inactive.set()
+        finally:
+            self._processing = None
 
         play_ad: bool = False
         if play_ad:
@@ -129,17 +228,138 @@ class Player():
             await ad_complete.wait()            
             self._client.play(source, after=self._on_finish)
 
-        # wait until signalled that the player is inactive
-        await self._inactive.wait()
-        log.debug(f'Finished request {request.metadata.id}: {request.metadata.title}')
+        # wait until signalled that the player is inactive, checkpointing the playback position
+        while not self._inactive.is_set():
+            try:
+                await asyncio.wait_for(self._inactive.wait(), CHECKPOINT_INTERVAL)
+            except TimeoutError:
+                if self._journal: await self._journal.checkpoint(entry, entry.start + time.monotonic() - started)
+        log.debug(f'Finished request {entry.id}: {entry.title}')
 
         # clear the current request
         del self._queue.current
+        if self._journal: await self._journal.remove(entry)
+
+        # if the queue has run out, ask for the next request
+        if self._autoplay and not self._stopped and self._client and self._queue.peek() is None and entry.request:
+            await self._continue(entry.request)
 
         if not self._client or not self._client.is_connected():
             log.info('Disconnecting...')
             await self.disconnect()
 
+    async def _continue(self, request: Request) -> None:
+        """
+        Queue the autoplay request following a finished request, if any.
+        """
+
+        if not self._autoplay: return
+
+        try:
+            upcoming: Optional[Request] = await self._autoplay(request)
+            if upcoming is None: return
+            log.debug(f'Autoplaying request {upcoming.metadata.id}: {upcoming.metadata.title}')
+            entry: QueueEntry = QueueEntry.of(upcoming)
+            await self._queue.put(entry)
+            await self._record(entry)
+        except Exception as exception:
+            log.warning(f'Could not autoplay after request {request.metadata.id}: {exception}')
+
+    async def _record(self, entry: QueueEntry) -> None:
+        """
+        Persist a queued entry for the connected guild.
+        """
+
+        if self._journal is None or self._client is None: return
+        try:
+            await self._journal.add(self._client.guild.id, entry)
+        except Exception as exception:
+            log.warning(f'Could not persist request {entry.id}: {exception}')
+
+    def _hydrate(self, entry: QueueEntry) -> Request:
+        """
+        Get the request of an entry, rebuilding it if it was compacted.
+        """
+
+        if entry.request is None:
+            if self._hydrator is None: raise AudioError(f'Cannot restore queued request {entry.title}')
+            log.debug(f'Rebuilding request {entry.id}: {entry.title}')
+            entry.request = self._hydrator(entry)
+        return entry.request
+
+    async def _source(self, entry: QueueEntry) -> AudioSource:
+        """
+        Get the audio source for an entry, using the prepared request if available.
+        """
+
+        # take ownership of the prepared entry, if any
+        prepared: Optional[Tuple[QueueEntry, asyncio.Task[Request]]] = self._prepared
+        self._prepared = None
+
+        request: Optional[Request] = None
+        if prepared:
+            upcoming, task = prepared
+            # if the prepared entry is the one being played, use its extracted request
+            if upcoming is entry: request = await task
+            # otherwise cancel the stale extraction
+            elif not task.done(): task.cancel()
+
+        # start FFmpeg only now, so its connection and any signed stream URL are fresh at the boundary
+        return await self._process(entry, request if request else self._hydrate(entry))
+
+    async def _process(self, entry: QueueEntry, request: Request) -> AudioSource:
+        """
+        Process a request into an audio source, tracking the source's process.
+        """
+
+        async with PROFILER.profile(type(request).__name__, 'process'):
+            source: AudioSource = await request.process(bitrate=self.bitrate)
+        REGISTRY.track_source(source, label='track', guild_id=self._client.guild.id if self._client else None, request_id=entry.id)
+        return source
+
+    def _prepare(self) -> None:
+        """
+        Begin extracting the upcoming request so its metadata lookup happens off the track boundary.
+        """
+
+        # if prefetching is disabled, return
+        if not self._prefetch: return
+        # if a request is already being prepared, return
+        if self._prepared: return
+
+        # get the upcoming entry, if any
+        upcoming: Optional[QueueEntry] = self._queue.peek()
+        if upcoming is None: return
+
+        try:
+            request: Request = self._hydrate(upcoming)
+        except Exception as exception:
+            log.warning(f'Could not prepare request {upcoming.id}: {exception}')
+            return
+
+        log.debug(f'Preparing request {upcoming.id}: {upcoming.title}')
+        self._prepared = (upcoming, asyncio.create_task(self._extract(request)))
+
+    async def _extract(self, request: Request) -> Request:
+        """
+        Extract a request's metadata and stream location without starting its FFmpeg process.
+        """
+
+        # attachments are read by FFmpeg from their URL, so only extractions are worth doing early
+        if isinstance(request, YouTubeRequest):
+            async with PROFILER.profile(type(request).__name__, 'prefetch'):
+                await request.parse()
+        return request
+
+    def _cancel(self) -> None:
+        """
+        Cancel processing of the current request and extraction of the prepared request.
+        """
+
+        if self._processing and not self._processing.done(): self._processing.cancel()
+        if self._prepared and not self._prepared[1].done(): self._prepared[1].cancel()
+        self._prepared = None
+
     def _on_finish(self, exception: Optional[Exception]) -> None:
         """
         Called when a request has been fulfilled.
@@ -204,8 +424,8 @@ class Player():
             # connect to the channel and store the voice client
             self._client = await channel.connect()
 
-            # play connection tone
-            await self._play_tone(self.tone)
+            # play connection tone without delaying the caller
+            self._greeting = asyncio.create_task(self._play_tone(self.tone))
 
         # catch client exceptions that may occur
         except ClientException as exception:
@@ -240,24 +460,41 @@ class Player():
             pass
         
         finally:
+            # cancel work for requests that will not be played on this connection
+            self._cancel()
             # set the voice client to None
             self._client = None
             # signal the voice client is not connected
             self._connection.clear()
 
-    async def queue(self, interaction: Interaction, request: Request) -> None:
+    async def queue(self, interaction: Interaction, request: Union[Request, QueueEntry]) -> None:
         """
-        Adds a request to the queue.
+        Adds a request, or a previously queued entry, to the queue.
         """
 
-        # put the request in the queue
-        await self._queue.put(request)
+        entry: QueueEntry = request if isinstance(request, QueueEntry) else QueueEntry.of(request)
+        # only the next entry holds its request, so long queues stay small until played
+        if self._queue.peek() is not None: entry.compact()
+
+        # put the entry in the queue
+        await self._queue.put(entry)
+        # persist the entry so it survives a restart
+        await self._record(entry)
+        # resume autoplay if playback was stopped
+        self._stopped = False
+        # if a request is playing, prepare the upcoming request
+        if self.current: self._prepare()
 
     async def skip(self, interaction: Interaction) -> None:
         """
         Skips the remainder of the current request.
         """
         
+        # if the current request is still being processed, cancel it
+        if self._processing and not self._processing.done():
+            self._processing.cancel()
+            return
+
         # if the voice client is unavailable, return
         if self._client is None: return
         # stop playback of the current request
@@ -282,6 +519,11 @@ class Player():
         if self._client is None: return
         # clear queued requests
         await self._queue.clear()
+        if self._journal: await self._journal.clear(self._client.guild.id)
+        # suspend autoplay until a request is queued
+        self._stopped = True
+        # cancel processing of the current and prepared requests
+        self._cancel()
         # stop playback of the current request
         self._client.stop()
 
@@ -297,20 +539,28 @@ class Player():
             # store the buffer in a stream
             file_fp: BufferedIOBase = BytesIO(file_data)
         # get the audio source from the file object
-        return FFmpegOpusAudio(file_fp, pipe=True)
+        source: AudioSource = FFmpegOpusAudio(file_fp, pipe=True)
+        REGISTRY.track_source(source, label='tone', guild_id=self._client.guild.id if self._client else None)
+        return source
 
     async def _play_tone(self, source: Optional[AudioSource]) -> None:
         # if no source was provided, return
         if source is None: return
-        # if the voice client is unavailable, return
-        if self._client is None: return
+        # if the voice client is unavailable, release the source and return
+        if self._client is None: return REGISTRY.release(source)
 
-        # signal the player is no longer inactive
-        self._inactive.clear()
-        # play the source
-        self._client.play(source, after=self._on_finish)
-        # wait until signalled that the player is inactive
-        await self._inactive.wait()
+        try:
+            # signal the player is no longer inactive
+            self._inactive.clear()
+            # play the source
+            self._client.play(source, after=self._on_finish)
+            # wait until signalled that the player is inactive
+            await self._inactive.wait()
+        except Exception as exception:
+            # the tone is not essential, so log and continue
+            log.warning(exception)
+            REGISTRY.release(source)
+            self._inactive.set()
 
 class PlaybackExceptionEmbed(discord.Embed):
 
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from logging import Logger
+from typing import TYPE_CHECKING, Any, Dict, Mapping, Optional
+
+if TYPE_CHECKING:
+    from yt_dlp import YoutubeDL
+
+log: Logger = logging.getLogger(__name__)
+
+
+class DownloaderPool():
+    """
+    A bounded pool of long-lived downloaders.
+
+    Each worker thread owns one downloader, so an instance is only ever used by
+    the thread that created it and keeps its extractor, cookie and signature
+    caches between extractions. Downloaders are recycled after a number of uses
+    or once they reach a maximum age.
+    """
+
+    def __init__(self, options: Mapping[str, Any], *, size: int = 4, uses: int = 100, lifetime: timedelta = timedelta(hours=1)) -> None:
+        """
+        Initialize a pool of downloaders created with the provided options. Downloaders are created on first use.
+        """
+
+        self._options: Mapping[str, Any] = options
+        """The options each downloader is created with."""
+
+        self._uses: int = uses
+        """The number of extractions after which a downloader is recycled."""
+
+        self._lifetime: float = lifetime.total_seconds()
+        """The age in seconds after which a downloader is recycled."""
+
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='DownloaderPool')
+        """The executor owning the worker threads."""
+
+        self._local: threading.local = threading.local()
+        """The downloader owned by each worker thread."""
+
+    async def extract(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Extract info for a query on a pooled downloader, without downloading media.
+        """
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._extract, query)
+
+    def close(self) -> None:
+        """
+        Stop the worker threads. Their downloaders are released with the threads.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _extract(self, query: str) -> Optional[Dict[str, Any]]:
+        downloader: YoutubeDL = self._checkout()
+        return downloader.extract_info(query, download=False) # type: ignore
+
+    def _checkout(self) -> YoutubeDL:
+        # get this thread's downloader, recycling it if it is spent
+        downloader: Optional[YoutubeDL] = getattr(self._local, 'downloader', None)
+        if downloader is not None and (self._local.uses >= self._uses or time.monotonic() - self._local.created >= self._lifetime):
+            log.debug(f'Recycling downloader on {threading.current_thread().name} after {self._local.uses} uses')
+            downloader.close()
+            downloader = None
+
+        if downloader is None:
+            # the downloader is heavy, so load it on first use
+            from yt_dlp import YoutubeDL
+            downloader = YoutubeDL(dict(self._options)) # type: ignore
+            self._local.downloader, self._local.uses, self._local.created = downloader, 0, time.monotonic()
+
+        self._local.uses += 1
+        return downloader
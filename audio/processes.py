@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import os
+import subprocess
+import time
+import weakref
+from datetime import timedelta
+from logging import Logger
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, NoReturn, Optional, Tuple, Union
+
+from discord import AudioSource
+
+log: Logger = logging.getLogger(__name__)
+
+Process = Union[subprocess.Popen[bytes], asyncio.subprocess.Process]
+
+
+class ProcessRecord():
+    """
+    A tracked child process.
+    """
+
+    def __init__(self, process: Process, *, label: str, guild_id: Optional[int], request_id: Optional[int], owner: Optional[Any]) -> None:
+        self.process: Process = process
+        """The child process."""
+
+        self.label: str = label
+        """What the process is for."""
+
+        self.guild_id: Optional[int] = guild_id
+        """The guild the process is working for, if any."""
+
+        self.request_id: Optional[int] = request_id
+        """The request the process is working for, if any."""
+
+        self.owner: Optional[weakref.ref[Any]] = weakref.ref(owner) if owner is not None else None
+        """The object responsible for releasing the process, if any."""
+
+        self.started: float = time.monotonic()
+        """The monotonic time the process was registered at."""
+
+        self.sample: Tuple[float, float] = (self.started, _cpu_time(process.pid) or 0)
+        """The monotonic time and CPU seconds at the last sample."""
+
+    @property
+    def exited(self) -> bool:
+        """Whether the process has exited. Exited Popen processes are reaped by checking."""
+        if isinstance(self.process, subprocess.Popen): return self.process.poll() is not None
+        return self.process.returncode is not None
+
+    @property
+    def orphaned(self) -> bool:
+        """Whether the process outlived the object responsible for releasing it."""
+        return self.owner is not None and self.owner() is None
+
+
+class ProcessUsage(NamedTuple):
+    """
+    A resource usage sample for a tracked process.
+    """
+
+    pid: int
+    """The process id."""
+
+    label: str
+    """What the process is for."""
+
+    guild_id: Optional[int]
+    """The guild the process is working for, if any."""
+
+    request_id: Optional[int]
+    """The request the process is working for, if any."""
+
+    age: float
+    """The number of seconds since the process was registered."""
+
+    cpu: Optional[float]
+    """The percentage of a core used since the last sample, if available."""
+
+    rss: Optional[int]
+    """The resident memory in bytes, if available."""
+
+
+class ProcessRegistry():
+    """
+    Tracks the child processes spawned for playback, so they can be sampled and reaped.
+
+    Processes are released by their audio source's cleanup. Any process that
+    outlives its source, or is left running past its owner, is killed by the
+    periodic reaper.
+    """
+
+    def __init__(self) -> None:
+        self._records: Dict[int, ProcessRecord] = dict()
+        """The tracked processes by process id."""
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def track(self, process: Process, *, label: str, guild_id: Optional[int] = None, request_id: Optional[int] = None, owner: Optional[Any] = None) -> None:
+        """
+        Track a child process, optionally owned by an object that must outlive it.
+        """
+        self._records[process.pid] = ProcessRecord(process, label=label, guild_id=guild_id, request_id=request_id, owner=owner)
+
+    def track_source(self, source: AudioSource, *, label: str, guild_id: Optional[int] = None, request_id: Optional[int] = None) -> None:
+        """
+        Track the FFmpeg process of an audio source, if it has one.
+        """
+
+        process: Optional[subprocess.Popen[bytes]] = getattr(source, '_process', None)
+        if not isinstance(process, subprocess.Popen): return
+        self.track(process, label=label, guild_id=guild_id, request_id=request_id, owner=source)
+
+    def release(self, source: Optional[AudioSource]) -> None:
+        """
+        Clean up an audio source, terminating its process.
+        """
+
+        if source is None: return
+        try:
+            source.cleanup()
+        except Exception as exception:
+            log.warning(f'Could not clean up audio source: {exception}')
+        self.reap()
+
+    def reap(self) -> int:
+        """
+        Forget exited processes and kill orphaned ones. Returns the number of processes killed.
+        """
+
+        killed: int = 0
+        for pid, record in list(self._records.items()):
+            if record.exited:
+                del self._records[pid]
+            elif record.orphaned:
+                log.warning(f'Killing orphaned {record.label} process {pid} for request {record.request_id}')
+                _kill(record.process)
+                killed += 1
+        return killed
+
+    async def loop(self, interval: timedelta) -> NoReturn:
+        """
+        Reap processes at the provided interval.
+        """
+
+        while True:
+            await asyncio.sleep(interval.total_seconds())
+            try:
+                killed: int = self.reap()
+                if killed: log.info(f'Reaped {killed} orphaned processes')
+            except Exception as exception:
+                log.error(f'Process reaping failed: {exception}')
+
+    def usage(self) -> List[ProcessUsage]:
+        """
+        Sample the resource usage of every running tracked process.
+        """
+
+        self.reap()
+        now: float = time.monotonic()
+        samples: List[ProcessUsage] = []
+        for pid, record in self._records.items():
+            # measure CPU usage over the interval since the previous sample
+            cpu_time: Optional[float] = _cpu_time(pid)
+            cpu: Optional[float] = None
+            if cpu_time is not None:
+                previous_time, previous_cpu = record.sample
+                cpu = 100 * (cpu_time - previous_cpu) / max(now - previous_time, 1e-6)
+                record.sample = (now, cpu_time)
+            samples.append(ProcessUsage(pid, record.label, record.guild_id, record.request_id, now - record.started, cpu, _rss(pid)))
+        return samples
+
+
+def _kill(process: Process) -> None:
+    try:
+        process.kill()
+        # collect the exit status of a killed Popen so it does not linger as a zombie
+        if isinstance(process, subprocess.Popen): process.wait(timeout=5)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        pass
+
+def _cpu_time(pid: int) -> Optional[float]:
+    # CPU accounting is read from procfs, which is only available on Linux
+    try:
+        fields: List[str] = Path(f'/proc/{pid}/stat').read_text().rsplit(')', 1)[1].split()
+        # utime and stime are the 14th and 15th fields, counted after the command name
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    except (OSError, IndexError, ValueError):
+        return None
+
+def _rss(pid: int) -> Optional[int]:
+    try:
+        return int(Path(f'/proc/{pid}/statm').read_text().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+CLOCK_TICKS: int = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+"""The number of CPU clock ticks per second."""
+
+PAGE_SIZE: int = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+"""The number of bytes in a memory page."""
+
+REGISTRY: ProcessRegistry = ProcessRegistry()
+"""The registry of every playback process."""
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import tracemalloc
+from collections import deque
+from contextlib import asynccontextmanager
+from logging import Logger
+from typing import AsyncIterator, Deque, Dict, List, Literal, NamedTuple, Optional, Tuple
+
+log: Logger = logging.getLogger(__name__)
+
+Stage = Literal['parse', 'prefetch', 'process']
+
+
+class MemorySummary(NamedTuple):
+    """
+    Peak memory allocated by one stage of a request type.
+    """
+
+    kind: str
+    """The request type."""
+
+    stage: Stage
+    """The stage of request handling."""
+
+    count: int
+    """The number of recent samples."""
+
+    mean: float
+    """The mean peak bytes allocated over recent samples."""
+
+    maximum: int
+    """The largest peak bytes allocated over recent samples."""
+
+    sites: List[str]
+    """The allocation sites that retained the most memory after the largest sample, formatted."""
+
+
+class MemoryProfiler():
+    """
+    Opt-in tracemalloc profiling of request handling by request type and stage.
+
+    Peaks are process-wide, so a stage is only sampled when no other stage
+    overlaps it. Allocations made by other concurrent work during a stage are
+    still attributed to it, so samples are indicative rather than exact.
+    """
+
+    def __init__(self, *, frames: int = 10, history: int = 50, sites: int = 25) -> None:
+        """
+        Initialize a disabled profiler.
+        """
+
+        self._frames: int = frames
+        """The number of stack frames recorded per allocation."""
+
+        self._history: int = history
+        """The number of recent samples kept per request type and stage."""
+
+        self._sites: int = sites
+        """The number of allocation sites kept for the largest sample."""
+
+        self._peaks: Dict[Tuple[str, Stage], Deque[int]] = dict()
+        """Recent peak bytes allocated, by request type and stage."""
+
+        self._largest: Dict[Tuple[str, Stage], Tuple[int, List[tracemalloc.StatisticDiff]]] = dict()
+        """The largest sample's peak bytes and allocation sites, by request type and stage."""
+
+        self._active: List[_Section] = []
+        """The stages being profiled."""
+
+    @property
+    def enabled(self) -> bool:
+        """Whether allocations are being traced."""
+        return tracemalloc.is_tracing()
+
+    def enable(self) -> None:
+        """
+        Start tracing allocations.
+        """
+
+        if self.enabled: return
+        log.info('Enabling memory profiling')
+        tracemalloc.start(self._frames)
+
+    def disable(self) -> None:
+        """
+        Stop tracing allocations, keeping collected samples.
+        """
+        tracemalloc.stop()
+
+    @asynccontextmanager
+    async def profile(self, kind: str, stage: Stage) -> AsyncIterator[None]:
+        """
+        Sample the memory allocated by a stage of handling a request of the provided type.
+        """
+
+        if not self.enabled:
+            yield
+            return
+
+        # resetting the peak affects every stage, so overlapping stages cannot be sampled
+        section: _Section = _Section()
+        for other in self._active: other.overlapped = section.overlapped = True
+        self._active.append(section)
+
+        before: Optional[tracemalloc.Snapshot] = None
+        baseline: int = 0
+        try:
+            # snapshots walk every trace, so take them off the event loop
+            before = await asyncio.to_thread(_snapshot)
+            if not section.overlapped:
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+            yield
+        finally:
+            self._active.remove(section)
+            # tracing may have been disabled during the stage
+            if self.enabled and before and not section.overlapped:
+                peak: int = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+                self._peaks.setdefault((kind, stage), deque(maxlen=self._history)).append(peak)
+
+                # keep the allocation sites of the largest sample only, as comparing snapshots is costly
+                largest, _ = self._largest.get((kind, stage), (-1, []))
+                if peak > largest:
+                    after: tracemalloc.Snapshot = await asyncio.to_thread(_snapshot)
+                    self._largest[(kind, stage)] = (peak, after.compare_to(before, 'lineno')[:self._sites])
+            elif section.overlapped:
+                log.debug(f'Not sampling {stage} of {kind}, as it overlapped another profiled stage')
+
+    def summary(self, *, top: int = 5) -> List[MemorySummary]:
+        """
+        Summarize recent peaks for each request type and stage, with the top allocation sites of the largest sample.
+        """
+
+        summaries: List[MemorySummary] = []
+        for (kind, stage), peaks in sorted(self._peaks.items()):
+            _, statistics = self._largest.get((kind, stage), (0, []))
+            sites: List[str] = [f'{statistic.traceback[0]}: {statistic.size_diff / 2**10:+.0f} KiB' for statistic in statistics[:top]]
+            summaries.append(MemorySummary(kind, stage, len(peaks), sum(peaks) / len(peaks), max(peaks), sites))
+        return summaries
+
+
+class _Section():
+    """
+    A stage being profiled.
+    """
+
+    __slots__ = ('overlapped',)
+
+    def __init__(self) -> None:
+        self.overlapped: bool = False
+        """Whether another stage ran during this one."""
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(IGNORED)
+
+
+IGNORED: List[tracemalloc.Filter] = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+"""Excludes the profiler's own allocations from reports."""
+
+PROFILER: MemoryProfiler = MemoryProfiler()
+"""The profiler for every request."""
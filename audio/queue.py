@@ -15,7 +15,7 @@ class Queue(Generic[RequestType], Iterable[RequestType]):
     
     @current.deleter
     def current(self) -> None:
-        del self._current
+        self._current = None
 
     def __init__(self) -> None:
         """
@@ -42,6 +42,12 @@ class Queue(Generic[RequestType], Iterable[RequestType]):
         item: RequestType = await self._queue.get()
         self._current = self._deque.popleft()
         return item
+
+    def peek(self) -> Optional[RequestType]:
+        """
+        Get the next request in the queue without removing it.
+        """
+        return self._deque[0] if self._deque else None
     
     async def clear(self) -> None:
         """
@@ -49,6 +55,8 @@ class Queue(Generic[RequestType], Iterable[RequestType]):
         """
         self._current = None
         self._deque.clear()
+        # drain the underlying queue so cleared requests are not produced
+        while not self._queue.empty(): self._queue.get_nowait()
 
     def __iter__(self) -> Iterator[RequestType]:
         return self._deque.__iter__()
\ No newline at end of file
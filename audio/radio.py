@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from logging import Logger
+from pathlib import Path
+from typing import TYPE_CHECKING, Collection, Deque, Dict, List, Optional, Tuple
+
+Session = Tuple[Optional[int], Optional[int]]
+"""A listening session key of guild id and user id."""
+
+import discord
+
+from .database import AsyncDatabase
+from .metadata import Metadata
+
+if TYPE_CHECKING:
+    from scipy.sparse import csr_matrix
+
+log: Logger = logging.getLogger(__name__)
+
+
+class Radio():
+    """
+    A track co-occurrence model built from request history.
+
+    Requests made by the same user in the same guild within a session of each
+    other are counted as co-occurring. Counts are kept in a sparse matrix
+    indexed by track, so picking the next track is a single row lookup. New
+    counts are merged into the matrix off the event loop at each checkpoint.
+    """
+
+    def __init__(self, path: Path, *, session: timedelta = timedelta(minutes=30), span: int = 5, checkpoint: int = 25) -> None:
+        """
+        Initialize an empty model cached at the provided path.
+        """
+
+        self._path: Path = path
+        """The path the model is cached at."""
+
+        self._session: timedelta = session
+        """The maximum gap between requests in the same session."""
+
+        self._span: int = span
+        """The number of preceding requests in a session that a request co-occurs with."""
+
+        self._checkpoint: int = checkpoint
+        """The number of observations between cache writes."""
+
+        self._tracks: Dict[str, int] = dict()
+        """The matrix index of each track, keyed by hyperlink."""
+
+        self._hyperlinks: List[str] = []
+        """The hyperlink of each track, by matrix index."""
+
+        self._matrix: Optional[csr_matrix] = None
+        """The co-occurrence counts."""
+
+        self._pending: Dict[Tuple[int, int], float] = dict()
+        """Co-occurrence counts observed since the matrix was last compacted."""
+
+        self._recent: OrderedDict[Session, Deque[Tuple[datetime, int]]] = OrderedDict()
+        """The most recent requests of each session, least recently active first."""
+
+        self._deferred: List[Tuple[Metadata, Optional[int]]] = []
+        """Requests observed while history was still loading, with their guild ids."""
+
+        self._loaded: bool = False
+        """Whether the model has caught up with history."""
+
+        self._compacting: asyncio.Lock = asyncio.Lock()
+        """Serializes merging pending counts into the matrix."""
+
+        self._last_id: int = 0
+        """The id of the most recently observed request."""
+
+        self._unsaved: int = 0
+        """The number of observations since the cache was written."""
+
+    def __len__(self) -> int:
+        return len(self._hyperlinks)
+
+    async def load(self, database: AsyncDatabase) -> None:
+        """
+        Load the cached model, then observe any history requested since it was written.
+        """
+
+        try:
+            await asyncio.to_thread(self._read)
+            log.info(f'Loaded radio model with {len(self)} tracks up to request {self._last_id}')
+
+            async for row in database.stream(SELECT_SINCE, (self._last_id,)):
+                self._observe(Metadata.__from_row__(row), None)
+        finally:
+            # count requests made while history was loading, in request order
+            self._loaded = True
+            for metadata, guild_id in sorted(self._deferred, key=lambda item: item[0].id): self._observe(metadata, guild_id)
+            self._deferred.clear()
+
+        await self.save()
+
+    def observe(self, metadata: Metadata, guild_id: Optional[int] = None) -> None:
+        """
+        Count a request as co-occurring with the preceding requests in its session,
+        deferring it until history has loaded.
+        """
+
+        if self._loaded: self._observe(metadata, guild_id)
+        else: self._deferred.append((metadata, guild_id))
+
+    def _observe(self, metadata: Metadata, guild_id: Optional[int]) -> None:
+        if not metadata.hyperlink: return
+        if metadata.id <= self._last_id: return
+        self._last_id = metadata.id
+
+        index: Optional[int] = self._tracks.get(metadata.hyperlink, None)
+        if index is None:
+            index = len(self._hyperlinks)
+            self._tracks[metadata.hyperlink] = index
+            self._hyperlinks.append(metadata.hyperlink)
+
+        timestamp: datetime = discord.utils.snowflake_time(metadata.id)
+        # forget sessions that have been idle too long to continue
+        while self._recent:
+            idle: Deque[Tuple[datetime, int]] = next(iter(self._recent.values()))
+            if timestamp - idle[-1][0] <= self._session: break
+            self._recent.popitem(last=False)
+
+        session: Session = (guild_id, metadata.user_id)
+        recent: Deque[Tuple[datetime, int]] = self._recent.pop(session, None) or deque(maxlen=self._span)
+        for previous_timestamp, previous in recent:
+            if timestamp - previous_timestamp > self._session: continue
+            if previous == index: continue
+            self._pending[(index, previous)] = self._pending.get((index, previous), 0) + 1
+            self._pending[(previous, index)] = self._pending.get((previous, index), 0) + 1
+
+        recent.append((timestamp, index))
+        self._recent[session] = recent
+        self._unsaved += 1
+
+    def next(self, hyperlink: str, *, exclude: Collection[str] = ()) -> Optional[str]:
+        """
+        Get the track that most often co-occurs with the provided track, ignoring excluded tracks.
+        """
+
+        index: Optional[int] = self._tracks.get(hyperlink, None)
+        if index is None: return None
+
+        # use the matrix as of the last checkpoint, so picking never merges counts on the event loop
+        matrix: Optional[csr_matrix] = self._matrix
+        if matrix is None or index >= matrix.shape[0]: return None
+
+        # read the row's non-zero entries directly from the compressed structure
+        start, end = matrix.indptr[index], matrix.indptr[index + 1]
+        candidates: List[Tuple[float, int]] = sorted(zip(matrix.data[start:end], matrix.indices[start:end]), reverse=True)
+        for _, column in candidates:
+            if self._hyperlinks[column] not in exclude: return self._hyperlinks[column]
+        return None
+
+    async def checkpoint(self) -> None:
+        """
+        Merge new observations into the matrix, writing the model to the cache if enough have accumulated.
+        """
+
+        if self._unsaved >= self._checkpoint: await self.save()
+        elif self._pending: await self._compact()
+
+    async def save(self) -> None:
+        """
+        Write the model to the cache.
+        """
+
+        compacted: Optional[Tuple[csr_matrix, List[str], int]] = await self._compact()
+        if compacted is None: return
+        self._unsaved = 0
+        # the compacted matrix is never mutated, so it can be written off the event loop
+        await asyncio.to_thread(self._write, *compacted)
+
+    async def _compact(self) -> Optional[Tuple[csr_matrix, List[str], int]]:
+        async with self._compacting:
+            size: int = len(self._hyperlinks)
+            if size == 0: return None
+
+            # take the state to merge, so observations made while merging are kept for the next merge
+            hyperlinks, last_id, pending = list(self._hyperlinks), self._last_id, self._pending
+            self._pending = dict()
+            if pending or self._matrix is None or self._matrix.shape != (size, size):
+                self._matrix = await asyncio.to_thread(_merge, self._matrix, pending, size)
+            return self._matrix, hyperlinks, last_id
+
+    def _read(self) -> None:
+        from scipy.sparse import load_npz
+
+        vocabulary: Path = self._path.with_suffix('.json')
+        if not self._path.exists() or not vocabulary.exists(): return
+
+        with open(vocabulary, 'r') as file: state = json.load(file)
+        self._hyperlinks = state['hyperlinks']
+        self._tracks = { hyperlink : index for index, hyperlink in enumerate(self._hyperlinks) }
+        self._last_id = state['last_id']
+        self._matrix = load_npz(self._path).tocsr()
+
+    def _write(self, matrix: csr_matrix, hyperlinks: List[str], last_id: int) -> None:
+        from scipy.sparse import save_npz
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        save_npz(self._path, matrix)
+        with open(self._path.with_suffix('.json'), 'w') as file: json.dump({ 'hyperlinks': hyperlinks, 'last_id': last_id }, file)
+
+
+def _merge(matrix: Optional[csr_matrix], pending: Dict[Tuple[int, int], float], size: int) -> csr_matrix:
+    # sparse dependencies are heavy, so load them on first use
+    from scipy.sparse import coo_matrix, csr_matrix
+
+    # build a new matrix rather than resizing, as the current one may be read while this runs
+    merged: csr_matrix = csr_matrix((size, size))
+    if matrix is not None:
+        current: coo_matrix = matrix.tocoo()
+        merged = coo_matrix((current.data, (current.row, current.col)), shape=(size, size)).tocsr()
+    if pending:
+        rows, columns = zip(*pending.keys())
+        merged = (merged + coo_matrix((list(pending.values()), (rows, columns)), shape=(size, size))).tocsr()
+    return merged
+
+
+SELECT_SINCE: str = 'SELECT ID, UserID, Title, Artist, Hyperlink, NULL AS Thumbnail FROM Metadata WHERE ID > ? ORDER BY ID'
+"""Selects requests made after the provided id, in request order."""
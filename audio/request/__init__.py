@@ -1,12 +1,13 @@
 import logging
 from logging import Logger
-from typing import Literal, Protocol
+from typing import List, Optional, Protocol, Tuple
 
 import discord
 from discord import AudioSource
 
 from ..embed import RequestEmbed
 from ..metadata import Metadata
+from ..thumbnail import ThumbnailFormat
 
 log: Logger = logging.getLogger(__name__)
 
@@ -22,20 +23,47 @@ class Request(Protocol):
         Retrieve metadata for the request
         """
         return NotImplemented
+
+    @property
+    def start(self) -> float:
+        """
+        The position in seconds playback starts from
+        """
+        return 0
     
-    async def process(self) -> AudioSource:
+    async def process(self, *, bitrate: Optional[int] = None) -> AudioSource:
         """
-        Process the request data into an AudioSource
+        Process the request data into an AudioSource, encoded for the provided channel bitrate in kbps
         """
         return NotImplemented
     
-    async def as_embed(self, interaction: discord.Interaction, *, large_image: bool = True, thumbnail_format: Literal['png', 'bmp'] = 'png') -> RequestEmbed:
+    async def as_embed(self, interaction: discord.Interaction, *, large_image: bool = True, thumbnail_format: Optional[ThumbnailFormat] = None) -> RequestEmbed:
         """
         Generate an embed for the request
         """
         return RequestEmbed(self.metadata, interaction.user, interaction.created_at, large_image=large_image, thumbnail_format=thumbnail_format)
     
 
+def encoder_options(bitrate: int) -> List[str]:
+    """
+    Get the libopus options for encoding at the provided bitrate in kbps.
+    Encoder complexity is lowered for bitrates where it makes no audible difference.
+    """
+
+    complexity: int = next((level for limit, level in COMPLEXITY if bitrate <= limit), COMPLEXITY[-1][1])
+    return ['-compression_level', str(complexity)]
+
+
+COMPLEXITY: List[Tuple[int, int]] = [(64, 5), (96, 8), (512, 10)]
+"""The libopus complexity used up to each bitrate in kbps."""
+
+DEFAULT_BITRATE: int = 128
+"""The encode bitrate in kbps used when the channel bitrate is unknown."""
+
+RECONNECT: List[str] = ['-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_on_network_error', '1', '-reconnect_delay_max', '5']
+"""FFmpeg input options that resume reading a URL after a dropped connection."""
+
+
 from .file import FileRequest
 from .midi import MidiRequest
 from .youtube import YouTubeRequest
\ No newline at end of file
@@ -1,19 +1,33 @@
+import asyncio
 import logging
-from collections.abc import Buffer
+import os
+import tempfile
+import weakref
 from io import BufferedIOBase, BytesIO
 from logging import Logger
-from typing import (List, Literal, Optional)
+from pathlib import Path, PurePosixPath
+from typing import (TYPE_CHECKING, Any, BinaryIO, Dict, List, Literal, Optional, Tuple, Union)
+from urllib.parse import urlparse
 
 import discord
 from discord import AudioSource
 
 from ..embed import RequestEmbed
+from ..loudness import Loudness
 from ..metadata import Metadata
-from ..request import Request
-from ..parser import Parser
+from ..request import DEFAULT_BITRATE, RECONNECT, Request, encoder_options
+from ..thumbnail import ThumbnailFormat
+
+if TYPE_CHECKING:
+    from collections.abc import Buffer
+
+    from ..parser import Parser
 
 log: Logger = logging.getLogger(__name__)
 
+InputMode = Literal['url', 'spool', 'pipe']
+"""How FFmpeg reads an attachment: from its URL, from a local copy, or piped from memory."""
+
 
 class FileRequest(Request):
 
@@ -21,37 +35,160 @@ class FileRequest(Request):
     def metadata(self) -> Metadata:
         return self._metadata
     
-    async def process(self) -> AudioSource:
-        file_data: Buffer = await self._file.read()
-        file_fp: BufferedIOBase = BytesIO(file_data)
+    @property
+    def gain(self) -> Optional[float]:
+        """The gain in decibels applied during playback, if any."""
+        return self._gain
+
+    @gain.setter
+    def gain(self, value: Optional[float]) -> None:
+        self._gain = value
+
+    @property
+    def url(self) -> str:
+        """The URL of the attachment."""
+        return self._file.url if isinstance(self._file, discord.Attachment) else self._file
+
+    @property
+    def start(self) -> float:
+        return self._start
+
+    @property
+    def spooled(self) -> Optional[Path]:
+        """The local copy of the attachment, once downloaded."""
+        return self._spooled
+    
+    async def process(self, *, bitrate: Optional[int] = None) -> AudioSource:
+        # apply the normalization gain as a single-pass volume filter
+        filters: List[str] = ['-af', f'volume={self._gain:.2f}dB'] if self._gain is not None else []
+
+        # encode to opus in FFmpeg at the channel's bitrate
+        target: int = min(bitrate or DEFAULT_BITRATE, 512)
+        filters += encoder_options(target)
+        # resume from the start position, if any
+        seek: List[str] = ['-ss', f'{self._start:.1f}'] if self._start else []
+
+        # have FFmpeg read the attachment itself unless it is piped from memory
+        source: Union[str, BufferedIOBase]
+        if self._input_mode == 'url':
+            source, seek = self.url, RECONNECT + seek
+        elif self._input_mode == 'spool':
+            source = str(await self._spool())
+        else:
+            source = BytesIO(await self._read())
 
-        before_options: str = ' '.join(self._before_options)
+        before_options: str = ' '.join(self._before_options + seek)
         log.debug(f'Applying prepended streaming parameters: {before_options}')
-        after_options: str = ' '.join(self._after_options)
+        after_options: str = ' '.join(self._after_options + filters)
         log.debug(f'Applying postpended streaming parameters: {after_options}')
 
-        return discord.FFmpegPCMAudio(file_fp, pipe=True, before_options=before_options, options=after_options)
+        # an unset codec encodes with libopus, as discord.py stream-copies any codec it recognizes as opus
+        return discord.FFmpegOpusAudio(source, pipe=isinstance(source, BufferedIOBase), bitrate=target, codec=None, before_options=before_options, options=after_options)
     
-    def __init__(self, interaction: discord.Interaction, file: discord.Attachment, *, before_options: Optional[List[str]] = None, after_options: Optional[List[str]] = None):
-        self._interaction: discord.Interaction = interaction
-        self._file: discord.Attachment = file
+    def __init__(self, interaction: Optional[discord.Interaction], file: Union[discord.Attachment, str], *, metadata: Optional[Metadata] = None, start: float = 0, input_mode: InputMode = 'url', before_options: Optional[List[str]] = None, after_options: Optional[List[str]] = None):
+        """
+        Initialize a request from an attachment, or from the URL and metadata of a previously queued attachment.
+        """
+
+        if interaction is None and metadata is None: raise ValueError('Either an interaction or metadata is required')
+        self._interaction: Optional[discord.Interaction] = interaction
+        self._file: Union[discord.Attachment, str] = file
+        self._start: float = start
+        self._input_mode: InputMode = input_mode
         self._before_options: List[str] = before_options if before_options else []
         self._after_options: List[str] = after_options if after_options else []
-        self._metadata: Metadata = Metadata(interaction.id, user_id=interaction.user.id, title=file.filename, hyperlink=file.url)
+        filename: str = file.filename if isinstance(file, discord.Attachment) else PurePosixPath(urlparse(file).path).name
+        self._metadata: Metadata = metadata if metadata else Metadata(interaction.id, user_id=interaction.user.id, title=filename, hyperlink=self.url) # type: ignore
+        self._gain: Optional[float] = None
+        self._spooled: Optional[Path] = None
+
+    async def _read(self) -> bytes:
+        """
+        Read the attachment's contents into memory.
+        """
+
+        if isinstance(self._file, discord.Attachment): return await self._file.read()
+        # restored attachments are only known by URL
+        with BytesIO() as fp:
+            await asyncio.to_thread(_download, self._file, fp)
+            return fp.getvalue()
+
+    async def _spool(self) -> Path:
+        """
+        Download the attachment to a local file, once, removing it when the request is released.
+        """
+
+        if self._spooled: return self._spooled
+
+        descriptor, name = tempfile.mkstemp(prefix='audio-', suffix=PurePosixPath(urlparse(self.url).path).suffix)
+        path: Path = Path(name)
+        weakref.finalize(self, _remove, path)
+        with os.fdopen(descriptor, 'wb') as fp: await asyncio.to_thread(_download, self.url, fp)
+
+        self._spooled = path
+        return path
 
     async def parse(self) -> None:
         """
         Parse the request for detailed metadata
         """
-        buffer: Buffer = await self._file.read()
-        data: BufferedIOBase = BytesIO(buffer)
+        # the tag parser depends on mutagen and Pillow, so load it on first use
+        from ..parser import Parser
+
         try:
-            parser: Parser = Parser(data)
-            if parser.artists:  self._metadata.artist = ', '.join(parser.artists)
-            if parser.title:    self._metadata.title = ', '.join(parser.title)
-            if parser.cover:    self._metadata.thumbnail = bytes(parser.cover)
-        except:
-            pass
+            # read tags from the spooled file, or from the start of the attachment, as FFmpeg downloads it again anyway
+            data: BinaryIO = open(await self._spool(), 'rb') if self._input_mode == 'spool' else BytesIO()
+            with data:
+                if self._input_mode != 'spool':
+                    await asyncio.to_thread(_download, self.url, data, HEADER_SIZE)
+                    data.seek(0)
+                parser: Parser = Parser(data) # type: ignore
+                # read each tag separately, so one unreadable tag does not lose the others
+                replaygain: Optional[Tuple[float, float]] = _tag(parser, 'replaygain')
+                if replaygain and self._metadata.hyperlink:
+                    self._metadata.loudness = Loudness.from_replaygain(self._metadata.hyperlink, *replaygain)
+                artists: Optional[List[str]] = _tag(parser, 'artists')
+                if artists:     self._metadata.artist = ', '.join(artists)
+                title: Optional[List[str]] = _tag(parser, 'title')
+                if title:       self._metadata.title = ', '.join(title)
+                cover: Optional[Buffer] = _tag(parser, 'cover')
+                if cover:       self._metadata.thumbnail = bytes(cover)
+        except Exception as exception:
+            log.warning(f'Could not read tags of {self.url}: {exception}')
     
-    async def as_embed(self, interaction: discord.Interaction, *, large_image: bool = True, thumbnail_format: Literal['png', 'bmp'] = 'png') -> RequestEmbed:
-        return await super().as_embed(interaction, large_image=large_image, thumbnail_format=thumbnail_format)
\ No newline at end of file
+    async def as_embed(self, interaction: discord.Interaction, *, large_image: bool = True, thumbnail_format: Optional[ThumbnailFormat] = None) -> RequestEmbed:
+        return await super().as_embed(interaction, large_image=large_image, thumbnail_format=thumbnail_format)
+
+
+def _download(url: str, fp: BinaryIO, limit: Optional[int] = None) -> None:
+    import requests
+    # ask for only the leading bytes, and stop reading there should the server send everything
+    headers: Dict[str, str] = {'Range': f'bytes=0-{limit - 1}'} if limit else {}
+    with requests.get(url, headers=headers, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        written: int = 0
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            if limit: chunk = chunk[:limit - written]
+            fp.write(chunk)
+            written += len(chunk)
+            if limit and written >= limit: break
+
+def _tag(parser: 'Parser', name: str) -> Any:
+    try:
+        return getattr(parser, name)
+    except Exception as exception:
+        log.debug(f'Could not read {name} tag: {exception}')
+        return None
+
+def _remove(path: Path) -> None:
+    try:
+        path.unlink(missing_ok=True)
+    except OSError as exception:
+        log.warning(f'Could not remove spooled attachment {path}: {exception}')
+
+
+CHUNK_SIZE: int = 64 * 1024
+"""The number of bytes written per chunk when downloading an attachment."""
+
+HEADER_SIZE: int = 2 * 1024 * 1024
+"""The number of leading bytes of an attachment downloaded to read its tags, enough for a typical cover image."""
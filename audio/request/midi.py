@@ -1,19 +1,20 @@
+import asyncio
 import logging
 from collections.abc import Buffer
 from io import BufferedIOBase, BytesIO
 from pathlib import Path
-from typing import Literal, Optional
+from typing import TYPE_CHECKING, Optional
 
 import discord
-import numpy as np
 from discord import AudioSource
-from numpy.typing import NDArray
-from pretty_midi import PrettyMIDI
-from scipy.io.wavfile import write as write_wav
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
 
 from ..embed import RequestEmbed
 from ..metadata import Metadata
-from ..request import Request
+from ..request import DEFAULT_BITRATE, Request, encoder_options
+from ..thumbnail import ThumbnailFormat
 
 log: logging.Logger = logging.getLogger(__name__)
 
@@ -33,36 +34,18 @@ class MidiRequest(Request):
         self._midi: discord.Attachment = midi
         self._sf2: Optional[discord.Attachment] = sf2
 
-    async def process(self) -> AudioSource:
+    async def process(self, *, bitrate: Optional[int] = None) -> AudioSource:
         midi_data: Buffer = await self._midi.read()
-        midi_fp: BytesIO = BytesIO(midi_data)
 
         sf2_path: Optional[Path] = self.soundfonts.joinpath(self._sf2.filename) if self._sf2 else None
         if self._sf2 and sf2_path: await self._sf2.save(sf2_path)
 
-        # specify the sampling rate
-        sampling_rate: int = 44100
-
-        # initialize midi with data and synthesize to waveform
-        waveform: NDArray = PrettyMIDI(midi_file=midi_fp).fluidsynth(fs=sampling_rate, sf2_path=str(sf2_path) if sf2_path else None)
-        # calculate max amplitude
-        amplitude: int = np.iinfo(np.int16).max
-        # calculate the maximum of the waveform
-        maximum: NDArray = np.max(np.abs(waveform))
-        # normalize the waveform given the waveform's maximum and the amplitude
-        waveform = (waveform / maximum) * amplitude
-        # cast the waveform to a 16-bit array
-        waveform = waveform.astype(np.int16)
-        
-        # create a byte buffer
-        buffer: Buffer = bytes()
-        # initialize BytesIO with created buffer
-        fp: BufferedIOBase = BytesIO(buffer)
-        # write the waveform to the file object
-        write_wav(fp, 44100, waveform)
-
-        # create and return the audio source
-        return discord.FFmpegPCMAudio(fp, pipe=True)
+        # synthesize off the event loop; a cancelled request stops waiting for the result
+        fp: BufferedIOBase = await asyncio.to_thread(_synthesize, midi_data, sf2_path)
+
+        # create and return the audio source, encoded to opus at the channel's bitrate (an unset codec encodes with libopus)
+        target: int = min(bitrate or DEFAULT_BITRATE, 512)
+        return discord.FFmpegOpusAudio(fp, pipe=True, bitrate=target, codec=None, options=' '.join(encoder_options(target)))
 
     @property
     def soundfonts(self) -> Path:
@@ -70,5 +53,39 @@ class MidiRequest(Request):
         if not directory.exists(): directory.mkdir(parents=True, exist_ok=True)
         return directory        
 
-    async def as_embed(self, interaction: discord.Interaction, *, large_image: bool = True, thumbnail_format: Literal['png', 'bmp'] = 'png') -> RequestEmbed:
-        return await super().as_embed(interaction, large_image=large_image, thumbnail_format=thumbnail_format)
\ No newline at end of file
+    async def as_embed(self, interaction: discord.Interaction, *, large_image: bool = True, thumbnail_format: Optional[ThumbnailFormat] = None) -> RequestEmbed:
+        return await super().as_embed(interaction, large_image=large_image, thumbnail_format=thumbnail_format)
+
+
+def _synthesize(midi_data: Buffer, sf2_path: Optional[Path]) -> BufferedIOBase:
+    # synthesis dependencies are heavy, so load them on first use
+    import numpy as np
+    from pretty_midi import PrettyMIDI
+    from scipy.io.wavfile import write as write_wav
+
+    midi_fp: BytesIO = BytesIO(midi_data)
+
+    # specify the sampling rate
+    sampling_rate: int = 44100
+
+    # initialize midi with data and synthesize to waveform
+    waveform: NDArray = PrettyMIDI(midi_file=midi_fp).fluidsynth(fs=sampling_rate, sf2_path=str(sf2_path) if sf2_path else None)
+    # calculate max amplitude
+    amplitude: int = np.iinfo(np.int16).max
+    # calculate the maximum of the waveform
+    maximum: NDArray = np.max(np.abs(waveform))
+    # normalize the waveform given the waveform's maximum and the amplitude
+    waveform = (waveform / maximum) * amplitude
+    # cast the waveform to a 16-bit array
+    waveform = waveform.astype(np.int16)
+
+    # create a byte buffer
+    buffer: Buffer = bytes()
+    # initialize BytesIO with created buffer
+    fp: BufferedIOBase = BytesIO(buffer)
+    # write the waveform to the file object
+    write_wav(fp, sampling_rate, waveform)
+
+    # rewind the file object so FFmpeg reads the waveform from the start
+    fp.seek(0)
+    return fp
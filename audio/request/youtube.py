@@ -1,18 +1,28 @@
+from __future__ import annotations
+
+import asyncio
 import logging
 from logging import Logger
 import re
 import subprocess
-from typing import Any, Dict, List, Literal, Mapping, Optional
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import ParseResult, parse_qs, urlencode, urlparse, urlunparse
 
 import discord
-import yt_dlp as youtube_dl
-from yt_dlp.utils import DownloadError
 from discord import AudioSource
 
 from ..embed import RequestEmbed
-from ..error import AudioError
-from ..metadata import Metadata
-from ..request import Request
+from ..cache import BACKOFF_REASONS, VIDEO_REASONS, Backoff, Failure, FailureCache, ResultCache, classify
+from ..error import AudioError, BackoffError, CachedFailureError
+from ..flight import SingleFlight
+from ..metadata import Metadata, fetch_thumbnail
+from ..pool import DownloaderPool
+from ..request import DEFAULT_BITRATE, RECONNECT, Request, encoder_options
+from ..thumbnail import ThumbnailFormat
+
+if TYPE_CHECKING:
+    import yt_dlp as youtube_dl
 
 log: Logger = logging.getLogger(__name__)
 
@@ -21,38 +31,78 @@ class YouTubeRequest(Request):
 
     @property
     def metadata(self) -> Metadata:
-        id:         int = self._interaction.id
-        user_id:    Optional[int] = self._interaction.user.id
-        title:      Optional[str] = self._tags.get('title', None)
-        artist:     Optional[str] = self._tags.get('channel', None)
-        webpage:    Optional[str] = self._tags.get('webpage_url', None)
-        thumbnail:  Optional[str] = self._tags.get('thumbnail', None)
-        return Metadata(id, user_id=user_id, title=title, artist=artist, hyperlink=webpage, thumbnail=thumbnail)
+        return self._metadata
+
+    @property
+    def gain(self) -> Optional[float]:
+        """The gain in decibels applied during playback, if any."""
+        return self._gain
+
+    @gain.setter
+    def gain(self, value: Optional[float]) -> None:
+        self._gain = value
+
+    @property
+    def query(self) -> str:
+        """The URL or search terms the request was made with."""
+        return self._query
+
+    @property
+    def start(self) -> float:
+        return self._start
         
-    def __init__(self, interaction: discord.Interaction, query: str, *, before_options: Optional[List[str]] = None, after_options: Optional[List[str]] = None):
-        self._interaction: discord.Interaction = interaction
-        self._query: str = query        
+    def __init__(self, interaction: Optional[discord.Interaction], query: str, *, metadata: Optional[Metadata] = None, start: float = 0, before_options: Optional[List[str]] = None, after_options: Optional[List[str]] = None):
+        """
+        Initialize a request from an interaction, or from the metadata of a previously queued request.
+        """
+
+        if interaction is None and metadata is None: raise ValueError('Either an interaction or metadata is required')
+        self._interaction: Optional[discord.Interaction] = interaction
+        self._query: str = query
+        self._start: float = start
         self._before_options: List[str] = before_options if before_options else []
         self._after_options: List[str] = after_options if after_options else []
         self._parsed: bool = False
+        self._gain: Optional[float] = None
+        self._metadata: Metadata = metadata if metadata else Metadata(interaction.id, user_id=interaction.user.id, title=query) # type: ignore
 
-    async def process(self) -> AudioSource:
+    async def process(self, *, bitrate: Optional[int] = None) -> AudioSource:
         await self.parse()
 
         try:
             source: Optional[str] = self._tags.get('url', None)
             if source is None: raise AudioError(f'Cannot find source media for {self._query}')
 
-            bitrate: Optional[int | Any] = self._tags.get('abr', None)
-            bitrate = bitrate if isinstance(bitrate, int) else None
+            # use the codec and bitrate reported by the extractor instead of running ffprobe
+            codec: Optional[str | Any] = self._tags.get('acodec', None)
+            codec = codec if isinstance(codec, str) else None
+            source_bitrate: Optional[float | Any] = self._tags.get('abr', None)
+            source_bitrate = round(source_bitrate) if isinstance(source_bitrate, (int, float)) else None
+
+            # apply the normalization gain as a single-pass volume filter, which requires re-encoding
+            filters: List[str] = ['-af', f'volume={self._gain:.2f}dB'] if self._gain is not None else []
+            # resume reading the stream after a dropped connection, and from the start position, if any
+            seek: List[str] = RECONNECT + (['-ss', f'{self._start:.1f}'] if self._start else [])
+
+            target: int
+            # pass opus streams the channel can carry through untouched
+            if codec == 'opus' and not filters and source_bitrate is not None and (bitrate is None or source_bitrate <= bitrate):
+                log.debug(f'Passing through {source_bitrate}kbps opus stream')
+                codec, target = 'copy', min(source_bitrate, 512)
+            # otherwise encode no higher than the channel or the source can carry
+            else:
+                target = min(bitrate or DEFAULT_BITRATE, source_bitrate or 512, 512)
+                log.debug(f'Encoding {codec} stream at {target}kbps')
+                # discord.py stream-copies any codec it recognizes as opus, so leave the codec unset to encode with libopus
+                codec = None
+                filters += encoder_options(target)
 
-            before_options: str = ' '.join(self._before_options)
+            before_options: str = ' '.join(self._before_options + seek)
             log.debug(f'Applying prepended streaming parameters: {before_options}')
-            after_options: str = ' '.join(self._after_options)
+            after_options: str = ' '.join(self._after_options + filters)
             log.debug(f'Applying postpended streaming parameters: {after_options}')
 
-            return await discord.FFmpegOpusAudio.from_probe(source, before_options=before_options, options=after_options)
-            return discord.FFmpegOpusAudio(source, bitrate=None, codec=None, before_options=before_options, options=after_options)       
+            return discord.FFmpegOpusAudio(source, bitrate=target, codec=codec, before_options=before_options, options=after_options)
         
         except subprocess.CalledProcessError as exception:
             raise exception
@@ -65,25 +115,65 @@ class YouTubeRequest(Request):
         # if the instance has already been parsed, return
         if self._parsed is True: return
 
+        # yt-dlp is heavy, so load it on first extraction along with the downloader pool
+        from yt_dlp.utils import DownloadError
+
+        key: str = normalize(self._query)
+        # fail immediately if the query recently failed
+        failure: Optional[Failure] = _failures.get(key)
+        if failure: raise CachedFailureError(self._query, failure.message)
+        # fail immediately if the extractor's domain is refusing requests
+        domain: str = to_domain(key)
+        delay: float = _backoff.remaining(domain)
+        if delay: raise BackoffError(domain, delay)
+
         try:
-            # use provided downloader or initialize one if not provided
-            downloader: youtube_dl.YoutubeDL = youtube_dl.YoutubeDL(DEFAULTS) # type: ignore
-            # extract info for the provided content
-            data: Optional[Dict[str, Any]] = downloader.extract_info(self._query, download=False) # type: ignore
-
-            # if unexpected data was extracted
-            if not isinstance(data, Dict): raise AudioError(f'Invalid metadata received for {self._query}')
-
-            # get the entries property, if it exists
-            entries: Optional[List[Any]] = data.get('entries') if data else None
-            # if the data contains a list of entries, use the list, otherwise create list from data (single entry)
-            results: List[Dict[str, Any]] = entries if entries else [data]
-            # return the first available result
-            result: Optional[Dict[str, Any]] = results[0]
-            # if no results are available
-            if not result: raise AudioError(f'No results found for {self._query}')
+            # reuse a recent extraction of the query, if any
+            result: Optional[Dict[str, Any]] = _extracted.get(key)
+            if result is None:
+                # extract info for the provided content, sharing any identical in-flight extraction
+                data: Optional[Dict[str, Any]] = await _extractions.run(key, lambda: _downloaders.extract(self._query))
+                _backoff.success(domain)
+
+                # if unexpected data was extracted
+                if not isinstance(data, Dict): raise AudioError(f'Invalid metadata received for {self._query}')
+
+                # get the entries property, if it exists
+                entries: Optional[List[Any]] = data.get('entries') if data else None
+                # if a search returned no entries, remember the failure
+                if entries is not None and len(entries) == 0:
+                    _failures.put([key], 'No results found')
+                    raise AudioError(f'No results found for {self._query}')
+                # if the data contains a list of entries, use the list, otherwise create list from data (single entry)
+                results: List[Dict[str, Any]] = entries if entries else [data]
+                # return the first available result
+                result = results[0]
+                # if no results are available
+                if not result: raise AudioError(f'No results found for {self._query}')
+
+                # remember only the fields playback needs, under the query and the page it resolved to
+                result = {field: result[field] for field in EXTRACTED_FIELDS if field in result}
+                webpage_url: Optional[str] = result.get('webpage_url', None)
+                _extracted.put([key, normalize(webpage_url)] if webpage_url else [key], result)
             # assign result to tags property
             self._tags: Dict[str, Any] = result
+
+            id:         int = self._metadata.id
+            user_id:    Optional[int] = self._metadata.user_id
+            title:      Optional[str] = self._tags.get('title', None)
+            artist:     Optional[str] = self._tags.get('channel', None)
+            webpage:    Optional[str] = self._tags.get('webpage_url', None)
+            media:      Optional[str] = self._tags.get('url', None)
+            thumbnail:  Optional[str] = self._tags.get('thumbnail', None)
+            # build the metadata once
+            self._metadata = Metadata(id, user_id=user_id, title=title, artist=artist, hyperlink=webpage, media_url=media)
+            if thumbnail:
+                # reuse a recently encoded thumbnail, otherwise download it without blocking the event loop, sharing any identical in-flight download
+                encoded: Optional[bytes] = _encoded.get(thumbnail)
+                if encoded is None:
+                    encoded = await _thumbnails.run(thumbnail, lambda: asyncio.to_thread(fetch_thumbnail, thumbnail))
+                    if encoded: _encoded.put([thumbnail], encoded)
+                self._metadata.thumbnail = encoded
             
             # mark the instance as parsed
             self._parsed = True      
@@ -92,12 +182,88 @@ class YouTubeRequest(Request):
             ansi_escape: re.Pattern[str] = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
             message: str = exception.msg if isinstance(exception.msg, str) else "Unknown error message format"
             inner: str = ansi_escape.sub('', message)
+
+            # remember the failure for the query, and for the video it resolved to if the video itself is unavailable
+            reason: str = classify(inner)
+            video: Optional[re.Match[str]] = VIDEO_PATTERN.search(inner)
+            keys: List[str] = [key, f'{video.group(1).lower()}:{video.group(2)}'] if video and reason in VIDEO_REASONS else [key]
+            _failures.put(keys, inner)
+            # back off the domain only when it is refusing requests or unreachable
+            if reason in BACKOFF_REASONS: _backoff.failure(domain)
             raise DownloadError('\n'.join(['An error occurred during download.', inner]), exc_info=exception.exc_info)
     
-    async def as_embed(self, interaction: discord.Interaction, *, large_image: bool = True, thumbnail_format: Literal['png', 'bmp'] = 'png') -> RequestEmbed:
+    async def as_embed(self, interaction: discord.Interaction, *, large_image: bool = True, thumbnail_format: Optional[ThumbnailFormat] = None) -> RequestEmbed:
         return await super().as_embed(interaction, large_image=large_image, thumbnail_format=thumbnail_format)
 
 
+TRACKING_PARAMETERS: List[str] = ['feature', 'si', 'pp', 'ab_channel']
+"""URL query parameters that do not affect the resolved media."""
+
+YOUTUBE_HOSTS: List[str] = ['youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com']
+"""Hosts that serve YouTube watch pages."""
+
+
+def normalize(query: str) -> str:
+    """
+    Normalize a query so equivalent queries share a key.
+    """
+
+    query = query.strip()
+    url: ParseResult = urlparse(query)
+
+    # normalize search terms by whitespace and case
+    if url.scheme not in ['http', 'https'] or not url.netloc:
+        return ' '.join(query.split()).casefold()
+
+    host: str = url.netloc.lower()
+    parameters: Dict[str, List[str]] = parse_qs(url.query)
+
+    # identify YouTube videos by their id regardless of URL form
+    if host in YOUTUBE_HOSTS and url.path == '/watch' and parameters.get('v'):
+        return f'youtube:{parameters["v"][0]}'
+    if host == 'youtu.be' and url.path.strip('/'):
+        return f'youtube:{url.path.strip("/")}'
+
+    # drop tracking parameters and fragments from other URLs
+    retained: List[Tuple[str, str]] = sorted((key, value) for key, values in parameters.items() if key not in TRACKING_PARAMETERS and not key.startswith('utm_') for value in values)
+    return urlunparse((url.scheme.lower(), host, url.path, url.params, urlencode(retained), ''))
+
+
+def to_domain(key: str) -> str:
+    """
+    Get the domain an extraction for a normalized query is made against.
+    """
+
+    # search terms are resolved by the default YouTube search
+    if key.startswith('youtube:') or not key.startswith(('http:', 'https:')): return 'youtube.com'
+    return urlparse(key).netloc
+
+
+VIDEO_PATTERN: re.Pattern[str] = re.compile(r'\[(\w+)\] ([\w-]+): ')
+"""Matches the extractor and video id that yt-dlp prefixes error messages with."""
+
+_failures: FailureCache = FailureCache()
+"""Recently failed extractions keyed by normalized query and video id."""
+
+_backoff: Backoff = Backoff()
+"""Extraction backoff per domain."""
+
+_extractions: SingleFlight[Optional[Dict[str, Any]]] = SingleFlight()
+"""In-flight extractions keyed by normalized query."""
+
+_thumbnails: SingleFlight[Optional[bytes]] = SingleFlight()
+"""In-flight thumbnail downloads keyed by URL."""
+
+EXTRACTED_FIELDS: List[str] = ['title', 'channel', 'webpage_url', 'url', 'thumbnail', 'acodec', 'abr']
+"""The extracted fields kept for playback, omitting the format lists that make up most of an extraction."""
+
+_extracted: ResultCache[Dict[str, Any]] = ResultCache(capacity=1024, ttl=timedelta(minutes=30))
+"""Recent extractions keyed by normalized query and resolved page, expiring well before their media URLs."""
+
+_encoded: ResultCache[bytes] = ResultCache(capacity=256, ttl=timedelta(hours=6))
+"""Recently encoded thumbnails keyed by URL."""
+
+
 class DownloadLogger(): # type: ignore
     def __init__(self, ydl: Any | youtube_dl.YoutubeDL | None = None) -> None:
         pass
@@ -135,4 +301,7 @@ DEFAULTS: Mapping[str, Any] = {
     ],
     'logger': AUDIO_LOGGER,
     'progress_hooks': [ ],
-}
\ No newline at end of file
+}
+
+_downloaders: DownloaderPool = DownloaderPool(DEFAULTS)
+"""Long-lived downloaders shared by every request."""
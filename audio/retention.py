@@ -0,0 +1,137 @@
+import asyncio
+import gzip
+import json
+import logging
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from logging import Logger
+from os import PathLike
+from pathlib import Path
+from typing import Any, Dict, List, NoReturn
+
+import discord
+
+from .database import AsyncDatabase
+
+log: Logger = logging.getLogger(__name__)
+
+
+class Retention():
+    """
+    Archives and removes request history older than a retention window, then compacts the database.
+    """
+
+    def __init__(self, database: AsyncDatabase, directory: Path, *, window: timedelta, batch: int = 1000) -> None:
+        """
+        Initialize a retention job for the provided database.
+        """
+
+        self._database: AsyncDatabase = database
+        """The database containing the Metadata table."""
+
+        self._directory: Path = directory
+        """The directory archives are written to."""
+
+        self._window: timedelta = window
+        """How long requests are kept in the database."""
+
+        self._batch: int = batch
+        """The number of rows archived per write."""
+
+    async def loop(self, interval: timedelta) -> NoReturn:
+        """
+        Run the job at the provided interval.
+        """
+
+        while True:
+            try:
+                await self.run()
+            except Exception as exception:
+                log.error(f'History maintenance failed: {exception}')
+            await asyncio.sleep(interval.total_seconds())
+
+    async def run(self) -> int:
+        """
+        Archive and remove expired requests, then compact the database. Returns the number of bytes reclaimed.
+        """
+
+        before: int = await self._size()
+        cutoff: int = discord.utils.time_snowflake(datetime.now(timezone.utc) - self._window)
+
+        # archive expired requests, without their thumbnails, in batches
+        archived: int = 0
+        last_id: int = 0
+        rows: List[Dict[str, Any]] = []
+        async for row in self._database.stream(SELECT_EXPIRED, (cutoff,), size=self._batch):
+            rows.append(dict(row))
+            if len(rows) >= self._batch:
+                await asyncio.to_thread(self._write, rows)
+                archived, last_id, rows = archived + len(rows), rows[-1]['ID'], []
+        if rows:
+            await asyncio.to_thread(self._write, rows)
+            archived, last_id = archived + len(rows), rows[-1]['ID']
+
+        # remove only the requests that were archived, in batches so each row's index trigger does not hold the database for long
+        while archived:
+            deleted: int = await self._database.execute(DELETE_ARCHIVED, (last_id, self._batch))
+            if deleted < self._batch: break
+            await asyncio.sleep(0)
+
+        await self._compact()
+        after: int = await self._size()
+
+        log.info(f'Archived {archived} requests and reclaimed {before - after} bytes')
+        return before - after
+
+    async def _compact(self) -> None:
+        try:
+            # incremental vacuuming requires the database to be rebuilt once after enabling it
+            mode: int = (await self._database.fetchone('PRAGMA auto_vacuum'))[0] # type: ignore
+            if mode != INCREMENTAL:
+                log.info('Enabling incremental vacuum')
+                # rebuild on a dedicated connection, so open cursors and other statements on the shared connection are unaffected
+                await asyncio.to_thread(_rebuild, self._database.path)
+            else:
+                await self._database.execute('PRAGMA incremental_vacuum')
+            # refresh query planner statistics
+            await self._database.execute('ANALYZE')
+        except sqlite3.OperationalError as exception:
+            log.warning(f'Could not compact the database, retrying at the next run: {exception}')
+
+    async def _size(self) -> int:
+        page_count: int = (await self._database.fetchone('PRAGMA page_count'))[0] # type: ignore
+        page_size: int = (await self._database.fetchone('PRAGMA page_size'))[0] # type: ignore
+        return page_count * page_size
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+        # group rows into monthly archives by request time
+        months: Dict[str, List[Dict[str, Any]]] = dict()
+        for row in rows:
+            month: str = discord.utils.snowflake_time(row['ID']).strftime('%Y-%m')
+            months.setdefault(month, []).append(row)
+
+        # appending to a gzip file adds a new member, so existing archive data is never rewritten
+        for month, items in months.items():
+            with gzip.open(self._directory.joinpath(f'metadata-{month}.jsonl.gz'), 'at', encoding='utf-8') as file:
+                for item in items: file.write(json.dumps(item) + '\n')
+
+
+def _rebuild(path: PathLike[str]) -> None:
+    connection: sqlite3.Connection = sqlite3.connect(path, timeout=30)
+    try:
+        connection.execute(f'PRAGMA auto_vacuum = {INCREMENTAL}')
+        connection.execute('VACUUM')
+    finally:
+        connection.close()
+
+
+INCREMENTAL: int = 2
+"""The auto_vacuum mode that allows incremental vacuuming."""
+
+SELECT_EXPIRED: str = 'SELECT ID, UserID, Title, Artist, Hyperlink FROM Metadata WHERE ID < ? ORDER BY ID'
+"""Selects requests made before the provided id, without their thumbnails."""
+
+DELETE_ARCHIVED: str = 'DELETE FROM Metadata WHERE ID IN (SELECT ID FROM Metadata WHERE ID <= ? ORDER BY ID LIMIT ?)'
+"""Removes up to the provided number of requests up to and including the provided id."""
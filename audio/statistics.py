@@ -0,0 +1,127 @@
+import logging
+from datetime import datetime, timezone
+from logging import Logger
+from typing import List, Literal, Optional, Sequence, Tuple
+
+import discord
+
+from .database import AsyncDatabase
+from .metadata import Metadata
+
+log: Logger = logging.getLogger(__name__)
+
+Scope = Literal['user', 'guild']
+Period = Literal['day', 'week', 'month', 'all']
+
+
+class Statistics():
+    """
+    Listening statistics, maintained incrementally as rollups of request counts per scope, period and track.
+    """
+
+    def __init__(self, database: AsyncDatabase) -> None:
+        """
+        Initialize statistics over the provided database.
+        """
+
+        self._database: AsyncDatabase = database
+        """The database containing the Metadata table."""
+
+    async def create(self) -> None:
+        """
+        Create the rollup table, populating it from existing history when it is first created.
+        """
+
+        exists: bool = await self._database.fetchone("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Rollup'") is not None
+
+        await self._database.executescript(SCHEMA)
+        # history does not record guilds, so existing requests are only counted per user
+        if not exists:
+            log.info('Building listening statistics rollups')
+            await self._database.execute(BACKFILL)
+
+    async def record(self, metadata: Metadata, guild_id: Optional[int]) -> None:
+        """
+        Count a request in every rollup it belongs to.
+        """
+        await self.recordmany([metadata], guild_id)
+
+    async def recordmany(self, metadata: Sequence[Metadata], guild_id: Optional[int]) -> None:
+        """
+        Count several requests in every rollup they belong to, in a single transaction.
+        """
+
+        parameters: List[Tuple[str, int, str, str, Optional[str], Optional[str]]] = []
+        for item in metadata:
+            # requests are identified by hyperlink, falling back to title
+            key: Optional[str] = item.hyperlink if item.hyperlink else item.title
+            if not key: continue
+
+            timestamp: datetime = discord.utils.snowflake_time(item.id)
+            periods: List[str] = [_period(period, timestamp) for period in ['day', 'week', 'month', 'all']]
+            scopes: List[Tuple[Scope, Optional[int]]] = [('user', item.user_id), ('guild', guild_id)]
+
+            parameters.extend(
+                (scope, scope_id, period, key, item.title, item.artist)
+                for scope, scope_id in scopes if scope_id is not None
+                for period in periods
+            )
+        if parameters: await self._database.executemany(UPSERT, parameters)
+
+    async def top(self, scope: Scope, scope_id: int, period: Period, *, limit: int = 5) -> List[Tuple[Metadata, int]]:
+        """
+        Get the most requested tracks for a scope in the current period.
+        """
+
+        key: str = _period(period, datetime.now(timezone.utc))
+        return [
+            (Metadata(0, title=row['Title'], artist=row['Artist'], hyperlink=row['Track'] if row['Track'] != row['Title'] else None), row['Count'])
+            async for row in self._database.stream(SELECT_TOP, (scope, scope_id, key, limit), size=limit)
+        ]
+
+
+def _period(period: Period, timestamp: datetime) -> str:
+    # these formats match the SQLite strftime formats used to backfill the rollups
+    if period == 'day': return timestamp.strftime('day:%Y-%m-%d')
+    if period == 'week': return timestamp.strftime('week:%Y-W%W')
+    if period == 'month': return timestamp.strftime('month:%Y-%m')
+    return 'all'
+
+
+SCHEMA: str = '''
+CREATE TABLE IF NOT EXISTS Rollup (
+    Scope TEXT NOT NULL,
+    ScopeID INTEGER NOT NULL,
+    Period TEXT NOT NULL,
+    Track TEXT NOT NULL,
+    Title TEXT,
+    Artist TEXT,
+    Count INTEGER NOT NULL,
+    PRIMARY KEY (Scope, ScopeID, Period, Track)
+);
+
+CREATE INDEX IF NOT EXISTS RollupRanking ON Rollup (Scope, ScopeID, Period, Count DESC);
+'''
+"""The rollup table and its ranking index."""
+
+UPSERT: str = '''
+INSERT INTO Rollup (Scope, ScopeID, Period, Track, Title, Artist, Count) VALUES (?, ?, ?, ?, ?, ?, 1)
+ON CONFLICT (Scope, ScopeID, Period, Track) DO UPDATE SET Count = Count + 1, Title = excluded.Title, Artist = excluded.Artist
+'''
+"""Counts a request in a rollup."""
+
+BACKFILL: str = '''
+INSERT INTO Rollup (Scope, ScopeID, Period, Track, Title, Artist, Count)
+SELECT 'user', UserID, strftime(Format, ((ID >> 22) + 1420070400000) / 1000, 'unixepoch') AS Period, COALESCE(Hyperlink, Title) AS Track, MAX(Title), MAX(Artist), COUNT(*)
+FROM Metadata CROSS JOIN (SELECT 'day:%Y-%m-%d' AS Format UNION ALL SELECT 'week:%Y-W%W' UNION ALL SELECT 'month:%Y-%m' UNION ALL SELECT 'all')
+WHERE UserID IS NOT NULL AND Track IS NOT NULL
+GROUP BY UserID, Period, Track
+'''
+"""Populates user rollups from existing history."""
+
+SELECT_TOP: str = '''
+SELECT Track, Title, Artist, Count FROM Rollup
+WHERE Scope = ? AND ScopeID = ? AND Period = ?
+ORDER BY Count DESC LIMIT ?
+'''
+"""Selects the most requested tracks in a rollup."""
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import functools
+import importlib.util
+import logging
+from io import BytesIO
+from logging import Logger
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal, Optional, Tuple
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+log: Logger = logging.getLogger(__name__)
+
+ThumbnailFormat = Literal['png', 'bmp', 'webp', 'jpeg']
+
+SIZE: Tuple[int, int] = (256, 256)
+"""The largest dimensions of a thumbnail."""
+
+BUDGET: int = 24 * 2**10
+"""The largest size in bytes of an encoded thumbnail."""
+
+QUALITY: Tuple[int, int] = (30, 85)
+"""The lowest and highest lossy encoding quality tried."""
+
+BACKGROUND: Tuple[int, int, int] = (0x31, 0x33, 0x38)
+"""The color transparent images are composited onto, matching the embed background."""
+
+
+def detect(data: bytes) -> ThumbnailFormat:
+    """
+    Detect the format of encoded thumbnail data from its signature.
+    """
+
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP': return 'webp'
+    if data[:3] == b'\xff\xd8\xff': return 'jpeg'
+    if data[:2] == b'BM': return 'bmp'
+    # thumbnails were stored as PNG before lossy encoding
+    return 'png'
+
+
+def encode(data: bytes, *, size: Tuple[int, int] = SIZE, budget: int = BUDGET) -> Optional[bytes]:
+    """
+    Resize encoded image data and re-encode it in a lossy format within the byte budget.
+    """
+
+    if not importlib.util.find_spec('PIL'): return None
+
+    from PIL import Image, UnidentifiedImageError
+    try:
+        image: Image.Image = Image.open(BytesIO(data))
+        # create a thumbnail from the image of size
+        image.thumbnail(size)
+    except (UnidentifiedImageError, OSError) as exception:
+        log.warning(f'Could not read thumbnail: {exception}')
+        return None
+    return _compress(image, budget)
+
+
+@functools.lru_cache(maxsize=4)
+def default_thumbnail(*, size: Tuple[int, int] = SIZE) -> Optional[bytes]:
+    """
+    Get the default thumbnail of size, encoded once and reused.
+    """
+
+    # get the path of the default png
+    path: Path = Path(__file__).parent.joinpath('default.png')
+    # if the file does not exist, return None
+    if not path.exists():
+        log.warning(f'Cannot find {path.name} in directory {path.parent}')
+        return None
+    return encode(path.read_bytes(), size=size)
+
+
+def _compress(image: Image.Image, budget: int) -> bytes:
+    format: ThumbnailFormat = _format()
+    image = _prepare(image, format)
+
+    # most thumbnails fit at the highest quality, so try it before searching
+    encoded: bytes = _save(image, format, QUALITY[1])
+    if len(encoded) <= budget: return encoded
+
+    # search for the highest quality within the budget
+    low, high = QUALITY[0], QUALITY[1] - 1
+    best: Optional[bytes] = None
+    while low <= high:
+        quality: int = (low + high) // 2
+        encoded = _save(image, format, quality)
+        if len(encoded) <= budget: best, low = encoded, quality + 1
+        else: high = quality - 1
+    if best is not None: return best
+
+    # halve the dimensions when even the lowest quality exceeds the budget
+    if min(image.size) <= 64: return encoded
+    image.thumbnail((image.width // 2, image.height // 2))
+    return _compress(image, budget)
+
+def _prepare(image: Image.Image, format: ThumbnailFormat) -> Image.Image:
+    from PIL import Image
+    transparent: bool = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    if not transparent: return image.convert('RGB')
+    image = image.convert('RGBA')
+    if format == 'webp': return image
+    # JPEG has no alpha channel, so composite transparent images onto a background
+    background: Image.Image = Image.new('RGB', image.size, BACKGROUND)
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+def _save(image: Image.Image, format: ThumbnailFormat, quality: int) -> bytes:
+    output: BytesIO = BytesIO()
+    if format == 'webp': image.save(output, format='webp', quality=quality, method=4)
+    else: image.save(output, format='jpeg', quality=quality, optimize=True, progressive=True)
+    return output.getvalue()
+
+@functools.lru_cache(maxsize=1)
+def _format() -> ThumbnailFormat:
+    # Pillow may be built without WebP support
+    from PIL import features
+    return 'webp' if features.check('webp') else 'jpeg'
+
@@ -0,0 +1,29 @@
+from typing import Awaitable, Callable, List, Optional
+
+import discord
+
+from .metadata import Metadata
+
+
+class RequeueView(discord.ui.View):
+
+    def __init__(self, metadata: List[Metadata], callback: Callable[[discord.Interaction, str], Awaitable[None]], *, timeout: Optional[float] = 180):
+        super().__init__(timeout=timeout)
+        # store the results that can be requeued
+        self._metadata: List[Metadata] = [item for item in metadata if item.hyperlink]
+        # store the callback that requeues a hyperlink
+        self._callback: Callable[[discord.Interaction, str], Awaitable[None]] = callback
+
+        options: List[discord.SelectOption] = [
+            discord.SelectOption(label=(item.title if item.title else 'Unknown Title')[:100], description=item.artist[:100] if item.artist else None, value=str(index))
+            for index, item in enumerate(self._metadata)
+        ]
+        self._select: discord.ui.Select[RequeueView] = discord.ui.Select(placeholder='Requeue a result', options=options)
+        self._select.callback = self._on_select
+        self.add_item(self._select)
+
+    async def _on_select(self, interaction: discord.Interaction) -> None:
+        # get the selected result
+        item: Metadata = self._metadata[int(self._select.values[0])]
+        # requeue the result's hyperlink
+        if item.hyperlink: await self._callback(interaction, item.hyperlink)
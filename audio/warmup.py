@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from logging import Logger
+from typing import Awaitable, Callable, List
+
+import discord
+
+from .database import AsyncDatabase
+from .error import BackoffError
+
+log: Logger = logging.getLogger(__name__)
+
+
+class Warmup():
+    """
+    Resolves the most requested tracks of recent history after a restart, so early requests find warm caches.
+    """
+
+    def __init__(self, database: AsyncDatabase, *, limit: int, interval: timedelta, window: timedelta = timedelta(days=30)) -> None:
+        """
+        Initialize a warm-up of the provided number of tracks, resolved one per interval.
+        """
+
+        self._database: AsyncDatabase = database
+        """The database containing the Metadata table."""
+
+        self._limit: int = limit
+        """The number of tracks resolved."""
+
+        self._interval: timedelta = interval
+        """The delay between resolving tracks."""
+
+        self._window: timedelta = window
+        """How far back requests are counted."""
+
+    async def tracks(self) -> List[str]:
+        """
+        Get the hyperlinks of the most requested tracks within the window, most requested first.
+        """
+
+        cutoff: int = discord.utils.time_snowflake(datetime.now(timezone.utc) - self._window)
+        return [row['Hyperlink'] for row in await self._database.fetchall(SELECT_POPULAR, (cutoff, self._limit))]
+
+    async def run(self, warm: Callable[[str], Awaitable[None]]) -> int:
+        """
+        Resolve each track with the provided callback at the configured rate. Returns the number of tracks resolved.
+        """
+
+        hyperlinks: List[str] = await self.tracks()
+        log.info(f'Warming caches for {len(hyperlinks)} tracks')
+
+        warmed: int = 0
+        for hyperlink in hyperlinks:
+            try:
+                await warm(hyperlink)
+                warmed += 1
+            # stop rather than add to the load on a domain that is refusing requests
+            except BackoffError as exception:
+                log.warning(f'Stopping cache warm-up: {exception}')
+                break
+            except Exception as exception:
+                log.debug(f'Could not warm caches for {hyperlink}: {exception}')
+            await asyncio.sleep(self._interval.total_seconds())
+
+        log.info(f'Warmed caches for {warmed} of {len(hyperlinks)} tracks')
+        return warmed
+
+
+SELECT_POPULAR: str = 'SELECT Hyperlink, COUNT(*) AS Count FROM Metadata WHERE ID >= ? AND Hyperlink IS NOT NULL GROUP BY Hyperlink ORDER BY Count DESC LIMIT ?'
+"""Selects the most requested hyperlinks since the provided id."""
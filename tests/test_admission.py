@@ -0,0 +1,27 @@
+import asyncio
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+if not importlib.util.find_spec('discord') or not importlib.util.find_spec('bot'):
+    pytest.skip('the package requires discord.py and the bot framework', allow_module_level=True)
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from audio import Admission, TokenBucket
+
+
+def test_zero_rate_is_unlimited() -> None:
+    bucket: TokenBucket = TokenBucket(0, 1)
+    for _ in range(10):
+        assert bucket.delay() == 0
+        bucket.take()
+
+
+def test_zero_rates_admit_without_waiting() -> None:
+    async def main() -> None:
+        admission: Admission = Admission(rate=0, burst=0, guild_rate=0, guild_burst=0, backlog=0)
+        for _ in range(10): await asyncio.wait_for(admission.admit(1), timeout=1)
+
+    asyncio.run(main())
@@ -0,0 +1,33 @@
+import importlib.util
+from pathlib import Path
+from types import ModuleType
+
+import pytest
+
+# load the module on its own, as the package imports discord
+spec = importlib.util.spec_from_file_location('cache', Path(__file__).parent.parent.joinpath('audio', 'cache.py'))
+assert spec and spec.loader
+cache: ModuleType = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(cache)
+
+
+@pytest.mark.parametrize('message', [
+    'ERROR: [youtube] abc: Join this channel to get access to members-only content like this video',
+    'ERROR: [youtube] abc: This live event will begin in 3 hours.',
+    'ERROR: [youtube] abc: Premieres in 2 hours',
+    'ERROR: [youtube] abc: The uploader has not made this video available in your country',
+    'ERROR: [youtube] abc: Requested format is not available',
+    'ERROR: [youtube] abc: This video is only available to Music Premium members',
+])
+def test_video_failures_do_not_back_off(message: str) -> None:
+    assert cache.classify(message) not in cache.BACKOFF_REASONS
+
+
+@pytest.mark.parametrize('message', [
+    'ERROR: [youtube] abc: HTTP Error 429: Too Many Requests',
+    'ERROR: [youtube] abc: Sign in to confirm you’re not a bot',
+    'ERROR: Unable to download webpage: The read operation timed out',
+    'ERROR: Unable to download webpage: [Errno 104] Connection reset by peer',
+])
+def test_domain_failures_back_off(message: str) -> None:
+    assert cache.classify(message) in cache.BACKOFF_REASONS
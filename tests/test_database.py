@@ -0,0 +1,34 @@
+import asyncio
+import importlib.util
+import sys
+from pathlib import Path
+from typing import List
+
+import pytest
+
+if not importlib.util.find_spec('discord') or not importlib.util.find_spec('bot'):
+    pytest.skip('the package requires discord.py and the bot framework', allow_module_level=True)
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from audio import AsyncDatabase
+
+SCHEMA: str = 'CREATE TABLE Metadata (ID INTEGER PRIMARY KEY, UserID INTEGER, Title TEXT, Artist TEXT, Hyperlink TEXT, Thumbnail BLOB)'
+"""The Metadata table as created by the bot framework."""
+
+
+def test_insertunique_moves_colliding_keys(tmp_path: Path) -> None:
+    async def main() -> None:
+        database: AsyncDatabase = AsyncDatabase(tmp_path.joinpath('audio.db'))
+        await database.execute(SCHEMA)
+        # another interaction was given the id a batch offsets its own to
+        await database.insert('Metadata', (101, 2, 'Other', None, None, None))
+
+        ids: List[int] = await database.insertunique('Metadata', [(100 + index, 1, f'Title {index}', None, None, None) for index in range(3)])
+
+        assert ids[0] == 100
+        assert len(set(ids)) == 3 and 101 not in ids
+        rows = await database.fetchall('SELECT ID, Title FROM Metadata')
+        assert { row['ID'] : row['Title'] for row in rows } == { 101: 'Other', **{ id : f'Title {index}' for index, id in enumerate(ids) } }
+        await database.close()
+
+    asyncio.run(main())
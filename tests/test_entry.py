@@ -0,0 +1,56 @@
+import gc
+import importlib.util
+import sys
+import weakref
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+if not importlib.util.find_spec('discord') or not importlib.util.find_spec('bot'):
+    pytest.skip('the package requires discord.py and the bot framework', allow_module_level=True)
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from audio import FileRequest, Metadata, QueueEntry, YouTubeRequest
+
+BUDGET: int = 1024
+"""The most bytes a compacted entry and its fields may occupy."""
+
+
+class Info(Dict[str, Any]):
+    """An extraction result that can be referenced weakly."""
+
+
+def test_compacted_entry_releases_request() -> None:
+    hyperlink: str = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+    metadata: Metadata = Metadata(1, user_id=2, title='Title', artist='Artist', hyperlink=hyperlink)
+    metadata.thumbnail = bytes(64 * 2**10)
+    request: YouTubeRequest = YouTubeRequest(None, hyperlink, metadata=metadata)
+    # stand in for a parsed request holding every format of the extraction
+    request._tags = Info(url='https://example.com/audio', formats=[{'url': f'https://example.com/{index}'} for index in range(500)])
+
+    entry: QueueEntry = QueueEntry.of(request)
+    references: Dict[str, weakref.ref[Any]] = {'request': weakref.ref(request), 'metadata': weakref.ref(metadata), 'info': weakref.ref(request._tags)}
+    del request, metadata
+
+    entry.compact()
+    gc.collect()
+
+    assert entry.request is None
+    assert [name for name, reference in references.items() if reference() is not None] == []
+    assert (entry.kind, entry.source, entry.title) == ('youtube', hyperlink, 'Title')
+
+    size: int = sys.getsizeof(entry) + sum(sys.getsizeof(getattr(entry, name)) for name in QueueEntry.__slots__)
+    assert size < BUDGET
+
+
+def test_compaction_keeps_spooled_attachment(tmp_path: Path) -> None:
+    hyperlink: str = 'https://cdn.example.com/track.flac'
+    request: FileRequest = FileRequest(None, hyperlink, metadata=Metadata(1, hyperlink=hyperlink), input_mode='spool')
+    # stand in for a parsed request whose attachment was downloaded
+    request._spooled = tmp_path.joinpath('track.flac')
+
+    entry: QueueEntry = QueueEntry.of(request)
+    entry.compact()
+
+    assert entry.request is request
@@ -0,0 +1,51 @@
+import asyncio
+import importlib.util
+from pathlib import Path
+from types import ModuleType
+
+# load the module on its own, as the package imports discord
+spec = importlib.util.spec_from_file_location('flight', Path(__file__).parent.parent.joinpath('audio', 'flight.py'))
+assert spec and spec.loader
+flight: ModuleType = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(flight)
+
+
+def test_join_after_abandon() -> None:
+    async def main() -> None:
+        flights = flight.SingleFlight()
+        calls: int = 0
+
+        async def factory() -> int:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return calls
+
+        abandoned = asyncio.create_task(flights.run('key', factory))
+        await asyncio.sleep(0)
+        # abandon the only caller, then join in the same iteration, before the cancelled execution lands
+        abandoned.cancel()
+        joined = asyncio.create_task(flights.run('key', factory))
+        await asyncio.gather(abandoned, return_exceptions=True)
+
+        # the late caller starts a new execution rather than receiving the cancellation
+        assert await joined == 2
+        assert len(flights) == 0
+
+    asyncio.run(main())
+
+
+def test_waiters_share_execution() -> None:
+    async def main() -> None:
+        flights = flight.SingleFlight()
+        calls: int = 0
+
+        async def factory() -> int:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        assert await asyncio.gather(flights.run('key', factory), flights.run('key', factory)) == [1, 1]
+
+    asyncio.run(main())
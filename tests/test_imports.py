@@ -0,0 +1,41 @@
+import importlib.util
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+if not importlib.util.find_spec('discord') or not importlib.util.find_spec('bot'):
+    pytest.skip('the package requires discord.py and the bot framework', allow_module_level=True)
+
+HEAVY: List[str] = ['numpy', 'scipy', 'pretty_midi', 'PIL', 'mutagen', 'requests', 'yt_dlp']
+"""Dependencies that must only load on first use of the request type needing them."""
+
+BUDGET: float = 1.0
+"""The most seconds importing the package may take, excluding discord.py itself."""
+
+SCRIPT: str = f'''
+import json, sys, time
+import discord
+started = time.perf_counter()
+import audio
+elapsed = time.perf_counter() - started
+print(json.dumps({{"elapsed": elapsed, "loaded": [name for name in {HEAVY!r} if name in sys.modules]}}))
+'''
+
+
+@pytest.fixture(scope='module')
+def result() -> Dict[str, Any]:
+    # import in a fresh interpreter, so modules loaded by other tests do not count
+    output: subprocess.CompletedProcess[str] = subprocess.run([sys.executable, '-c', SCRIPT], cwd=Path(__file__).parent.parent, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def test_heavy_dependencies_are_not_loaded(result: Dict[str, Any]) -> None:
+    assert result['loaded'] == []
+
+
+def test_import_time_within_budget(result: Dict[str, Any]) -> None:
+    assert result['elapsed'] < BUDGET
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import importlib.util
+import struct
+import sys
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO, List, Optional
+
+import pytest
+
+if not importlib.util.find_spec('discord') or not importlib.util.find_spec('bot'):
+    pytest.skip('the package requires discord.py and the bot framework', allow_module_level=True)
+pytest.importorskip('mutagen')
+Image = pytest.importorskip('PIL.Image')
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from mutagen.flac import FLAC, Picture
+from mutagen.id3 import ID3, TXXX
+from audio import FileRequest, Metadata
+from audio.parser import Parser
+import audio.request.file
+
+
+def _stream_info() -> bytes:
+    # 4096-sample blocks, 44.1kHz stereo 16-bit, no frames
+    fields: int = (44100 << 44) | (1 << 41) | (15 << 36)
+    return struct.pack('>HH', 4096, 4096) + b'\x00' * 6 + fields.to_bytes(8, 'big') + b'\x00' * 16
+
+def _flac(path: Path) -> bytes:
+    path.write_bytes(b'fLaC' + bytes([0x80, 0, 0, 34]) + _stream_info())
+    cover: BytesIO = BytesIO()
+    Image.new('RGB', (64, 64), (255, 0, 0)).save(cover, format='png')
+
+    file: FLAC = FLAC(path)
+    file['TITLE'] = 'Title'
+    file['ARTIST'] = 'Artist'
+    file['REPLAYGAIN_TRACK_GAIN'] = '-6.50 dB'
+    file['REPLAYGAIN_TRACK_PEAK'] = '0.950000'
+    picture: Picture = Picture()
+    picture.type, picture.mime, picture.data = 3, 'image/png', cover.getvalue()
+    file.add_picture(picture)
+    file.save()
+    return path.read_bytes()
+
+
+def test_flac_cover_and_replaygain(tmp_path: Path) -> None:
+    parser: Parser = Parser(BytesIO(_flac(tmp_path.joinpath('track.flac')))) # type: ignore
+    assert parser.cover
+    assert parser.replaygain == (-6.5, 0.95)
+
+
+def test_lowercase_id3_replaygain(tmp_path: Path) -> None:
+    path: Path = tmp_path.joinpath('track.mp3')
+    # silent 128kbps MPEG-1 layer III frames
+    path.write_bytes((b'\xff\xfb\x90\x00' + b'\x00' * 413) * 10)
+    tags: ID3 = ID3()
+    tags.add(TXXX(encoding=3, desc='replaygain_track_gain', text=['-3.00 dB']))
+    tags.add(TXXX(encoding=3, desc='replaygain_track_peak', text=['0.5']))
+    tags.save(path)
+    assert Parser(BytesIO(path.read_bytes())).replaygain == (-3.0, 0.5) # type: ignore
+
+
+def test_file_request_applies_flac_replaygain(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    data: bytes = _flac(tmp_path.joinpath('track.flac'))
+    limits: List[Optional[int]] = []
+    def download(url: str, fp: BinaryIO, limit: Optional[int] = None) -> None:
+        limits.append(limit)
+        fp.write(data)
+    monkeypatch.setattr(audio.request.file, '_download', download)
+
+    hyperlink: str = 'https://cdn.example.com/track.flac'
+    request: FileRequest = FileRequest(None, hyperlink, metadata=Metadata(1, hyperlink=hyperlink))
+    asyncio.run(request.parse())
+
+    assert request.metadata.loudness is not None
+    assert request.metadata.title == 'Title'
+    assert request.metadata.thumbnail
+    assert limits == [audio.request.file.HEADER_SIZE]
+
+
+def test_download_stops_at_limit_when_range_is_ignored() -> None:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            self.send_response(200)
+            self.send_header('Content-Length', str(2**20))
+            self.end_headers()
+            self.wfile.write(bytes(2**20))
+        def log_message(self, *args: object) -> None: pass
+
+    server: HTTPServer = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with BytesIO() as fp:
+            audio.request.file._download(f'http://127.0.0.1:{server.server_port}/track.flac', fp, 1000)
+            assert len(fp.getvalue()) == 1000
+    finally:
+        server.shutdown()
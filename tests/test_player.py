@@ -0,0 +1,67 @@
+import asyncio
+import importlib.util
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+import pytest
+
+if not importlib.util.find_spec('discord') or not importlib.util.find_spec('bot'):
+    pytest.skip('the package requires discord.py and the bot framework', allow_module_level=True)
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from discord import AudioSource
+from audio import Metadata, Player, QueueEntry, YouTubeRequest
+
+
+class Recording(YouTubeRequest):
+    """A request recording when it is extracted and when its FFmpeg process would start."""
+
+    def __init__(self, events: List[str]) -> None:
+        super().__init__(None, 'https://www.youtube.com/watch?v=dQw4w9WgXcQ', metadata=Metadata(1, title='Title'))
+        self.events: List[str] = events
+
+    async def parse(self) -> None:
+        self.events.append('parse')
+
+    async def process(self, *, bitrate: Optional[int] = None) -> AudioSource:
+        self.events.append('process')
+        return AudioSource()
+
+
+def test_prefetch_extracts_without_starting_ffmpeg() -> None:
+    async def main() -> None:
+        events: List[str] = []
+        player: Player = Player(prefetch=True)
+        entry: QueueEntry = QueueEntry.of(Recording(events))
+        await player._queue.put(entry)
+
+        player._prepare()
+        await asyncio.sleep(0)
+        assert events == ['parse']
+
+        # the source is only created once the entry is played
+        await player._source(entry)
+        assert events == ['parse', 'process']
+
+    asyncio.run(main())
+
+
+def test_processing_entry_is_reported_until_cancelled() -> None:
+    async def main() -> None:
+        player: Player = Player()
+        entry: QueueEntry = QueueEntry.of(Recording([]))
+        entry.compact()
+        await player._queue.put(entry)
+        await player._queue.get()
+
+        # stand in for a request whose FFmpeg process is still starting
+        player._processing = asyncio.create_task(asyncio.sleep(10)) # type: ignore
+        assert player.current is None
+        assert player.processing is entry
+
+        await player.skip(None) # type: ignore
+        await asyncio.sleep(0)
+        assert player.processing is None
+
+    asyncio.run(main())
@@ -0,0 +1,44 @@
+import asyncio
+import importlib.util
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+if not importlib.util.find_spec('discord') or not importlib.util.find_spec('bot'):
+    pytest.skip('the package requires discord.py and the bot framework', allow_module_level=True)
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from audio.profiling import MemoryProfiler
+
+
+@pytest.fixture
+def profiler() -> Iterator[MemoryProfiler]:
+    profiler: MemoryProfiler = MemoryProfiler()
+    profiler.enable()
+    yield profiler
+    profiler.disable()
+
+
+async def _allocate(profiler: MemoryProfiler, kind: str, size: int) -> None:
+    async with profiler.profile(kind, 'parse'):
+        data: bytes = bytes(size)
+        await asyncio.sleep(0.01)
+        del data
+
+
+def test_single_stage_is_sampled(profiler: MemoryProfiler) -> None:
+    asyncio.run(_allocate(profiler, 'Request', 2**20))
+    [summary] = profiler.summary()
+    assert summary.count == 1 and summary.maximum >= 2**20
+
+
+def test_overlapping_stages_are_not_sampled(profiler: MemoryProfiler) -> None:
+    async def main() -> None:
+        await asyncio.gather(_allocate(profiler, 'Small', 2**10), _allocate(profiler, 'Large', 2**20))
+
+    asyncio.run(main())
+    assert tracemalloc.is_tracing()
+    assert profiler.summary() == []
@@ -0,0 +1,89 @@
+import asyncio
+import importlib.util
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+if not importlib.util.find_spec('discord') or not importlib.util.find_spec('bot'):
+    pytest.skip('the package requires discord.py and the bot framework', allow_module_level=True)
+pytest.importorskip('scipy')
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import discord
+from audio import AsyncDatabase, Metadata, Radio
+
+SCHEMA: str = 'CREATE TABLE Metadata (ID INTEGER PRIMARY KEY, UserID INTEGER, Title TEXT, Artist TEXT, Hyperlink TEXT, Thumbnail BLOB)'
+"""The Metadata table as created by the bot framework."""
+
+STARTED: datetime = datetime.now(timezone.utc) - timedelta(hours=1)
+"""The time the first test request is made at."""
+
+
+def _request(minute: int, user_id: int, track: str) -> Metadata:
+    id: int = discord.utils.time_snowflake(STARTED + timedelta(minutes=minute))
+    return Metadata(id, user_id=user_id, title=track, hyperlink=f'https://www.youtube.com/watch?v={track}')
+
+async def _radio(tmp_path: Path) -> Radio:
+    database: AsyncDatabase = AsyncDatabase(tmp_path.joinpath('audio.db'))
+    await database.execute(SCHEMA)
+    radio: Radio = Radio(tmp_path.joinpath('radio.npz'))
+    await radio.load(database)
+    await database.close()
+    return radio
+
+def _next(radio: Radio, track: str) -> Optional[str]:
+    return radio.next(f'https://www.youtube.com/watch?v={track}')
+
+
+def test_sessions_are_kept_per_user_and_guild(tmp_path: Path) -> None:
+    async def main() -> None:
+        radio: Radio = await _radio(tmp_path)
+        # interleaved requests from different users and guilds
+        radio.observe(_request(0, 1, 'a'), 1)
+        radio.observe(_request(1, 2, 'x'), 1)
+        radio.observe(_request(2, 1, 'y'), 2)
+        radio.observe(_request(3, 1, 'b'), 1)
+        await radio.save()
+
+        assert _next(radio, 'a') == 'https://www.youtube.com/watch?v=b'
+        assert _next(radio, 'x') is None
+        assert _next(radio, 'y') is None
+
+    asyncio.run(main())
+
+
+def test_counts_are_merged_at_checkpoints(tmp_path: Path) -> None:
+    async def main() -> None:
+        radio: Radio = await _radio(tmp_path)
+        radio.observe(_request(0, 1, 'a'), 1)
+        radio.observe(_request(1, 1, 'b'), 1)
+        # picking reads the merged matrix only
+        assert _next(radio, 'a') is None
+
+        await radio.checkpoint()
+        assert _next(radio, 'a') == 'https://www.youtube.com/watch?v=b'
+
+    asyncio.run(main())
+
+
+def test_requests_during_load_are_observed(tmp_path: Path) -> None:
+    async def main() -> None:
+        database: AsyncDatabase = AsyncDatabase(tmp_path.joinpath('audio.db'))
+        await database.execute(SCHEMA)
+        await database.insertmany('Metadata', [_request(index, 1, f'h{index}').__values__() for index in range(3)])
+
+        radio: Radio = Radio(tmp_path.joinpath('radio.npz'))
+        loading: asyncio.Task[None] = asyncio.create_task(radio.load(database))
+        # requests made before the model has caught up with history
+        radio.observe(_request(3, 1, 'c'), 1)
+        radio.observe(_request(4, 1, 'd'), 1)
+        await loading
+        await database.close()
+
+        assert len(radio) == 5
+        assert _next(radio, 'c') == 'https://www.youtube.com/watch?v=d'
+
+    asyncio.run(main())
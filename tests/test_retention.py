@@ -0,0 +1,58 @@
+import asyncio
+import importlib.util
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+if not importlib.util.find_spec('discord') or not importlib.util.find_spec('bot'):
+    pytest.skip('the package requires discord.py and the bot framework', allow_module_level=True)
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import discord
+from audio import AsyncDatabase, History, Retention
+
+SCHEMA: str = 'CREATE TABLE Metadata (ID INTEGER PRIMARY KEY, UserID INTEGER, Title TEXT, Artist TEXT, Hyperlink TEXT, Thumbnail BLOB)'
+"""The Metadata table as created by the bot framework."""
+
+
+def test_archives_in_batches_and_enables_incremental_vacuum(tmp_path: Path) -> None:
+    async def main() -> None:
+        database: AsyncDatabase = AsyncDatabase(tmp_path.joinpath('audio.db'))
+        await database.execute(SCHEMA)
+        await History(database).create()
+
+        expired: int = discord.utils.time_snowflake(datetime.now(timezone.utc) - timedelta(days=60))
+        current: int = discord.utils.time_snowflake(datetime.now(timezone.utc))
+        await database.insertmany('Metadata', [(expired + index, 1, f'Old {index}', None, None, None) for index in range(5)] + [(current, 1, 'New', None, None, None)])
+
+        await Retention(database, tmp_path.joinpath('archive'), window=timedelta(days=30), batch=2).run()
+
+        titles = [row['Title'] for row in await database.fetchall('SELECT Title FROM Metadata')]
+        assert titles == ['New']
+        assert (await database.fetchone('PRAGMA auto_vacuum'))[0] == 2 # type: ignore
+        assert len(list(tmp_path.joinpath('archive').iterdir())) == 1
+        await database.close()
+
+    asyncio.run(main())
+
+
+def test_compacts_while_a_stream_is_open(tmp_path: Path) -> None:
+    async def main() -> None:
+        database: AsyncDatabase = AsyncDatabase(tmp_path.joinpath('audio.db'))
+        await database.execute(SCHEMA)
+        await database.insertmany('Metadata', [(index, 1, f'Title {index}', None, None, None) for index in range(1, 10)])
+
+        # hold a cursor open between batches, as the startup loads do
+        stream = database.stream('SELECT * FROM Metadata', size=2)
+        await anext(stream)
+        compacting: asyncio.Task[int] = asyncio.create_task(Retention(database, tmp_path.joinpath('archive'), window=timedelta(days=30)).run())
+        await asyncio.sleep(0.2)
+        async for _ in stream: pass
+
+        await compacting
+        assert (await database.fetchone('PRAGMA auto_vacuum'))[0] == 2 # type: ignore
+        await database.close()
+
+    asyncio.run(main())